@@ -0,0 +1,317 @@
+import getopt
+import importlib.util
+import io
+import json
+import multiprocessing
+import os.path as path
+import resource
+import sys
+import tempfile
+import time
+
+WrongArgsErr = 10
+OutputFileErr = 12
+
+def xml_program(lines):
+    """
+    Builds the XML source of the program
+
+    Parameters:
+    lines (list): Instructions as (opcode, [(type, text), ...]) tuples
+    """
+
+    xml = ['<?xml version="1.0" encoding="UTF-8"?>', '<program language="IPPcode20">']
+    for order, (opcode, args) in enumerate(lines, 1):
+        xml.append('<instruction order="{}" opcode="{}">'.format(order, opcode))
+        for index, (argType, text) in enumerate(args, 1):
+            xml.append('<arg{0} type="{1}">{2}</arg{0}>'.format(index, argType, text))
+        xml.append('</instruction>')
+    xml.append('</program>')
+    return "\n".join(xml) + "\n"
+
+def var(name):
+    return ("var", name)
+
+def const(argType, text):
+    return (argType, text)
+
+def label(name):
+    return ("label", name)
+
+def arith_loop(size):
+    """
+    ADD/MUL/SUB/IDIV loop executed size times
+    """
+
+    lines = [
+        ("DEFVAR", [var("GF@i")]), ("MOVE", [var("GF@i"), const("int", "0")]),
+        ("DEFVAR", [var("GF@x")]), ("MOVE", [var("GF@x"), const("int", "0")]),
+        ("LABEL", [label("loop")]),
+        ("ADD", [var("GF@i"), var("GF@i"), const("int", "1")]),
+        ("MUL", [var("GF@x"), var("GF@i"), const("int", "3")]),
+        ("SUB", [var("GF@x"), var("GF@x"), const("int", "1")]),
+        ("IDIV", [var("GF@x"), var("GF@x"), const("int", "2")]),
+        ("JUMPIFNEQ", [label("loop"), var("GF@i"), const("int", size)])]
+    return xml_program(lines), "", 5 + 5 * size
+
+def stack_arith_loop(size):
+    """
+    The same computation as arith_loop, written by the STACK extension instructions
+    """
+
+    lines = [
+        ("DEFVAR", [var("GF@i")]), ("MOVE", [var("GF@i"), const("int", "0")]),
+        ("DEFVAR", [var("GF@x")]),
+        ("LABEL", [label("loop")]),
+        ("PUSHS", [var("GF@i")]), ("PUSHS", [const("int", "1")]), ("ADDS", []), ("POPS", [var("GF@i")]),
+        ("PUSHS", [var("GF@i")]), ("PUSHS", [const("int", "3")]), ("MULS", []),
+        ("PUSHS", [const("int", "1")]), ("SUBS", []),
+        ("PUSHS", [const("int", "2")]), ("IDIVS", []), ("POPS", [var("GF@x")]),
+        ("PUSHS", [var("GF@i")]), ("PUSHS", [const("int", size)]), ("JUMPIFNEQS", [label("loop")])]
+    return xml_program(lines), "", 4 + 15 * size
+
+def string_building(size):
+    """
+    Builds the string of size characters by CONCAT, then rewrites every character by SETCHAR
+    """
+
+    lines = [
+        ("DEFVAR", [var("GF@s")]), ("MOVE", [var("GF@s"), const("string", "")]),
+        ("DEFVAR", [var("GF@i")]), ("MOVE", [var("GF@i"), const("int", "0")]),
+        ("LABEL", [label("build")]),
+        ("CONCAT", [var("GF@s"), var("GF@s"), const("string", "a")]),
+        ("ADD", [var("GF@i"), var("GF@i"), const("int", "1")]),
+        ("JUMPIFNEQ", [label("build"), var("GF@i"), const("int", size)]),
+        ("MOVE", [var("GF@i"), const("int", "0")]),
+        ("LABEL", [label("set")]),
+        ("SETCHAR", [var("GF@s"), var("GF@i"), const("string", "b")]),
+        ("ADD", [var("GF@i"), var("GF@i"), const("int", "1")]),
+        ("JUMPIFNEQ", [label("set"), var("GF@i"), const("int", size)]),
+        ("STRLEN", [var("GF@i"), var("GF@s")]), ("WRITE", [var("GF@i")])]
+    return xml_program(lines), "", 9 + 6 * size
+
+def deep_recursion(size):
+    """
+    CALL/RETURN recursion size levels deep, every level has its own local frame
+    """
+
+    lines = [
+        ("DEFVAR", [var("GF@d")]), ("MOVE", [var("GF@d"), const("int", "0")]),
+        ("CALL", [label("rec")]), ("WRITE", [var("GF@d")]), ("JUMP", [label("end")]),
+        ("LABEL", [label("rec")]),
+        ("CREATEFRAME", []), ("PUSHFRAME", []),
+        ("DEFVAR", [var("LF@x")]), ("MOVE", [var("LF@x"), var("GF@d")]),
+        ("ADD", [var("GF@d"), var("GF@d"), const("int", "1")]),
+        ("JUMPIFEQ", [label("back"), var("GF@d"), const("int", size)]),
+        ("CALL", [label("rec")]),
+        ("LABEL", [label("back")]),
+        ("POPFRAME", []), ("RETURN", []),
+        ("LABEL", [label("end")])]
+    return xml_program(lines), "", 3 + 10 * size
+
+def stack_heavy(size):
+    """
+    PUSHS/POPS loop executed size times
+    """
+
+    lines = [
+        ("DEFVAR", [var("GF@i")]), ("MOVE", [var("GF@i"), const("int", "0")]),
+        ("DEFVAR", [var("GF@a")]), ("DEFVAR", [var("GF@b")]),
+        ("LABEL", [label("loop")]),
+        ("PUSHS", [var("GF@i")]), ("PUSHS", [const("int", "1")]),
+        ("POPS", [var("GF@a")]), ("POPS", [var("GF@b")]),
+        ("ADD", [var("GF@i"), var("GF@i"), const("int", "1")]),
+        ("JUMPIFNEQ", [label("loop"), var("GF@i"), const("int", size)])]
+    return xml_program(lines), "", 5 + 6 * size
+
+def read_heavy(size):
+    """
+    Reads and sums size integers from the input
+    """
+
+    lines = [
+        ("DEFVAR", [var("GF@x")]),
+        ("DEFVAR", [var("GF@sum")]), ("MOVE", [var("GF@sum"), const("int", "0")]),
+        ("DEFVAR", [var("GF@i")]), ("MOVE", [var("GF@i"), const("int", "0")]),
+        ("LABEL", [label("loop")]),
+        ("READ", [var("GF@x"), ("type", "int")]),
+        ("ADD", [var("GF@sum"), var("GF@sum"), var("GF@x")]),
+        ("ADD", [var("GF@i"), var("GF@i"), const("int", "1")]),
+        ("JUMPIFNEQ", [label("loop"), var("GF@i"), const("int", size)]),
+        ("WRITE", [var("GF@sum")])]
+    inputText = "".join("{}\n".format(number) for number in range(size))
+    return xml_program(lines), inputText, 7 + 4 * size
+
+def straight_line(size):
+    """
+    Huge program without jumps, mostly measures the load time
+    """
+
+    lines = [("DEFVAR", [var("GF@x")]), ("MOVE", [var("GF@x"), const("int", "0")])]
+    lines += [("ADD", [var("GF@x"), var("GF@x"), const("int", "1")])] * size
+    return xml_program(lines), "", 2 + size
+
+# Benchmark name: (program generator, default size)
+benchmarks = {
+    "arith": (arith_loop, 100000),
+    "stack-arith": (stack_arith_loop, 100000),
+    "strings": (string_building, 20000),
+    "recursion": (deep_recursion, 20000),
+    "stack": (stack_heavy, 50000),
+    "read": (read_heavy, 50000),
+    "straight-line": (straight_line, 200000)}
+
+def load_interpret(scriptPath):
+    """
+    Imports the interpret script as a module, so it can be run in-process
+    """
+
+    spec = importlib.util.spec_from_file_location("interpret_under_test", scriptPath)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def load_program(module, sourceFile):
+    """
+    Loads the program from the source file by the interpret module
+    """
+
+    if (hasattr(module.XMLParse, "get_program")):
+        return module.XMLParse(sourceFile).get_program()
+
+    # Older versions take the XML string
+    with open(sourceFile, encoding="utf-8") as source:
+        program = module.XMLParse(source.read()).get_program_tree()
+    if (hasattr(module, "compile_program")):
+        program = module.compile_program(program)
+    return program
+
+def run_benchmark(scriptPath, sourceFile, inputFile, executed):
+    """
+    Runs one benchmark, it's called in a fresh process, so the peak RSS belongs only to it
+    """
+
+    module = load_interpret(scriptPath)
+
+    start = time.perf_counter()
+    program = load_program(module, sourceFile)
+    loadTime = time.perf_counter() - start
+
+    # The interpret reads stdin and writes stdout, when the files are not given
+    sys.stdin = open(inputFile, encoding="utf-8")
+    sys.stdout = io.StringIO()
+    # Older versions end by sys.exit, newer raise the exceptions with the code
+    exitTypes = (SystemExit,) + tuple(getattr(module, name) for name in ("ProgramExit", "InterpretError")
+                                      if hasattr(module, name))
+    start = time.perf_counter()
+    try:
+        module.Interpret(program, None).interpret_the_language()
+        errCode = 0
+    except exitTypes as exitCall:
+        errCode = exitCall.code
+    runTime = time.perf_counter() - start
+    sys.stdout = sys.__stdout__
+
+    return {"load-time": loadTime, "run-time": runTime, "instructions": executed,
+            "instructions-per-second": executed / runTime if runTime > 0 else None,
+            "peak-rss-kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "exit-code": errCode}
+
+def run_suite(scripts, names, size):
+    """
+    Runs the chosen benchmarks on every interpret script, returns the results
+    """
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as workDir:
+        for name in names:
+            generator, defaultSize = benchmarks[name]
+            benchSize = size if size is not None else defaultSize
+            source, inputText, executed = generator(benchSize)
+
+            sourceFile = path.join(workDir, name + ".xml")
+            inputFile = path.join(workDir, name + ".in")
+            with open(sourceFile, "w", encoding="utf-8") as stream:
+                stream.write(source)
+            with open(inputFile, "w", encoding="utf-8") as stream:
+                stream.write(inputText)
+
+            for script in scripts:
+                with context.Pool(1) as pool:
+                    result = pool.apply(run_benchmark, (script, sourceFile, inputFile, executed))
+                result.update({"benchmark": name, "size": benchSize, "script": script})
+                results.append(result)
+                print("{} ({}) {}: {:.0f} instructions/s, load {:.3f} s, peak RSS {} kB".format(name, benchSize, script,
+                      result["instructions-per-second"] or 0, result["load-time"], result["peak-rss-kb"]), file=sys.stderr)
+
+    return results
+
+def parse_and_check_args():
+    """
+    Parse the arguments from command line
+    """
+
+    scripts = []
+    names = []
+    size = None
+    outputFile = None
+    try:
+        options, args = getopt.getopt(sys.argv[1:], "", ["help", "int-script=", "benchmark=", "size=", "output="])
+    except getopt.GetoptError:
+        err_msg("Wrong arguments", WrongArgsErr)
+    for option, value in options:
+        if (option == "--help"):
+            print("Usage: python3.8 benchmark.py [--int-script=<file>]... [--benchmark=<name>]... [--size=<n>] [--output=<file>]")
+            print("Description: Runs the generated IPPcode20 programs and reports the instructions per second,")
+            print("             load time and peak RSS of every benchmark as JSON.")
+            print("             Pass --int-script more times to compare versions (e.g. before and after a change).")
+            print("Options: ")
+            print("     --int-script=<file>  Interpret script to measure (default ./interpret.py)")
+            print("     --benchmark=<name>   Benchmark to run (default all): {}".format(", ".join(benchmarks)))
+            print("     --size=<n>           Size of every benchmark (iterations, recursion depth, input lines, instructions)")
+            print("     --output=<file>      File, where the JSON results are written (default stdout)")
+            sys.exit(0)
+        elif (option == "--int-script"):
+            if (not path.isfile(value)):
+                err_msg("Wrong interpret script '{}'".format(value), WrongArgsErr)
+            scripts.append(path.abspath(value))
+        elif (option == "--benchmark"):
+            if (value not in benchmarks):
+                err_msg("Unknown benchmark '{}'".format(value), WrongArgsErr)
+            names.append(value)
+        elif (option == "--size"):
+            try:
+                size = int(value)
+            except ValueError:
+                err_msg("Size is not a number", WrongArgsErr)
+            if (size < 1):
+                err_msg("Size has to be positive", WrongArgsErr)
+        elif (option == "--output"):
+            outputFile = value
+
+    if (len(scripts) == 0):
+        scripts.append(path.join(path.dirname(path.abspath(__file__)), "interpret.py"))
+    if (len(names) == 0):
+        names = list(benchmarks)
+    return scripts, names, size, outputFile
+
+def err_msg(message, errCode):
+    """
+    Print the error message, and end with error code.
+    """
+
+    print("Error: " + message, file=sys.stderr)
+    sys.exit(errCode)
+
+if __name__ == '__main__':
+    (scripts, names, size, outputFile) = parse_and_check_args()
+    results = run_suite(scripts, names, size)
+
+    stream = sys.stdout
+    if (outputFile is not None):
+        try:
+            stream = open(outputFile, "w", encoding="utf-8")
+        except OSError:
+            err_msg("Output file '{}' cannot be opened".format(outputFile), OutputFileErr)
+    json.dump(results, stream, indent=2)
+    stream.write("\n")
@@ -3,9 +3,24 @@ import getopt
 import sys
 import xml.etree.ElementTree as xmlElementTree
 import re
+import shutil
+import tempfile
+import hashlib
+import marshal
+import io
+import os
+import json
+import time
+import multiprocessing
+import collections
+import signal
+import socket
+import socketserver
+import stat
 
 WrongArgsErr = 10
 InputFileErr = 11
+OutputFileErr = 12
 WrongXMLFromatErr = 31
 UnexpectedXMLStructureErr = 32
 
@@ -16,1249 +31,2939 @@ FrameDoesntExistsErr = 55
 MissingValueErr = 56
 WrongOperandValue = 57
 StringOperationErr = 58
+InstructionLimitErr = 59
 InternalErr = 99
 
-jumpingInst = ["RETURN", "CALL", "JUMP", "JUMPIFEQ", "JUMPIFNEQ"]
-instructionsWithoutArgs = ["CREATEFRAME", "PUSHFRAME", "POPFRAME", "RETURN", "BREAK"]
-instructionsWithOneArg = ["DEFVAR", "CALL", "PUSHS", "POPS", "WRITE", "LABEL", "JUMP", "EXIT", "DPRINT"]
+class InterpretError(Exception):
+    """
+    Error of the interpret, carries the exit code of the error
+    """
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+class ArgumentError(InterpretError):
+    pass
+
+class FileError(InterpretError):
+    pass
+
+class SourceFormatError(InterpretError):
+    pass
+
+class SemanticError(InterpretError):
+    pass
+
+class OperandTypeError(InterpretError):
+    pass
+
+class VariableError(InterpretError):
+    pass
+
+class FrameError(InterpretError):
+    pass
+
+class MissingValueError(InterpretError):
+    pass
+
+class OperandValueError(InterpretError):
+    pass
+
+class StringOperationError(InterpretError):
+    pass
+
+class InstructionLimitError(InterpretError):
+    pass
+
+class InternalError(InterpretError):
+    pass
+
+# Exception raised by err_msg for every error code
+errorClasses = {
+    WrongArgsErr: ArgumentError, InputFileErr: FileError, OutputFileErr: FileError,
+    WrongXMLFromatErr: SourceFormatError, UnexpectedXMLStructureErr: SourceFormatError,
+    SemanticErr: SemanticError, WrongOperandTypeErr: OperandTypeError, VariableDoesntExistsErr: VariableError,
+    FrameDoesntExistsErr: FrameError, MissingValueErr: MissingValueError, WrongOperandValue: OperandValueError,
+    StringOperationErr: StringOperationError, InstructionLimitErr: InstructionLimitError, InternalErr: InternalError}
+
+class ProgramExit(Exception):
+    """
+    The program ended by the EXIT instruction, it's not an error
+    """
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+jumpingInst = ["CALL", "JUMP", "JUMPIFEQ", "JUMPIFNEQ", "JUMPIFEQS", "JUMPIFNEQS"]
+# STACK extension instructions work only with the data stack
+stackInstructions = ["CLEARS", "ADDS", "SUBS", "MULS", "IDIVS", "LTS", "GTS", "EQS", "ANDS", "ORS", "NOTS",
+                     "INT2CHARS", "STRI2INTS"]
+instructionsWithoutArgs = ["CREATEFRAME", "PUSHFRAME", "POPFRAME", "RETURN", "BREAK"] + stackInstructions
+instructionsWithOneArg = ["DEFVAR", "CALL", "PUSHS", "POPS", "WRITE", "LABEL", "JUMP", "EXIT", "DPRINT",
+                          "JUMPIFEQS", "JUMPIFNEQS"]
 instructionsWithTwoArg = ["MOVE", "INT2CHAR", "READ", "STRLEN", "TYPE", "NOT"]
 instructionsWithThreeArg = ["ADD", "SUB", "MUL", "IDIV", "LT", "GT", "EQ", "AND", "OR", "STRI2INT", "CONCAT",
                             "GETCHAR", "SETCHAR", "JUMPIFEQ", "JUMPIFNEQ"]
 argumentTypes = ["int", "bool", "string", "nil", "label", "type", "var"]
 
+# Operands of every instruction (<var>, <symb>, <label> or <type>), checked when the program is loaded
+varSymbSymb = ("var", "symb", "symb")
+instructionOperands = {
+    "CREATEFRAME": (), "PUSHFRAME": (), "POPFRAME": (), "RETURN": (), "BREAK": (),
+    "DEFVAR": ("var",), "CALL": ("label",), "PUSHS": ("symb",), "POPS": ("var",), "WRITE": ("symb",),
+    "LABEL": ("label",), "JUMP": ("label",), "EXIT": ("symb",), "DPRINT": ("symb",),
+    "MOVE": ("var", "symb"), "INT2CHAR": ("var", "symb"), "READ": ("var", "type"), "STRLEN": ("var", "symb"),
+    "TYPE": ("var", "symb"), "NOT": ("var", "symb"),
+    "ADD": varSymbSymb, "SUB": varSymbSymb, "MUL": varSymbSymb, "IDIV": varSymbSymb, "LT": varSymbSymb,
+    "GT": varSymbSymb, "EQ": varSymbSymb, "AND": varSymbSymb, "OR": varSymbSymb, "STRI2INT": varSymbSymb,
+    "CONCAT": varSymbSymb, "GETCHAR": varSymbSymb, "SETCHAR": varSymbSymb,
+    "JUMPIFEQ": ("label", "symb", "symb"), "JUMPIFNEQ": ("label", "symb", "symb"),
+    "JUMPIFEQS": ("label",), "JUMPIFNEQS": ("label",)}
+instructionOperands.update((opcode, ()) for opcode in stackInstructions)
+intPattern = re.compile(r'^(\+|-|)[0-9]+$')
+escapePattern = re.compile(r'\\([0-9]{3})')
+varNamePattern = re.compile(r'^([LTG]F)@([a-zA-Z_\-\$&%*!?][0-9a-zA-Z_\-\$&%*!?]*)$')
+
 class Interpret(object):
-    def __init__(self, sourceProgram, inputFile):
+    def __init__(self, sourceProgram, inputFile, output=None, maxInsts=None, errors=None):
         self.instructPointer = 0
+        self.executed = 0
+        if (maxInsts is None):
+            maxInsts = sys.maxsize
+        self.maxInsts = maxInsts
         self.program = sourceProgram
+        if (inputFile is None):
+            inputFile = InputReader(sys.stdin)
         self.input = inputFile
-        self.GF = {}
+        # Every variable name has its slot, GF has its own slots, LF and TF share the local ones
+        self.globalNames, self.localNames = link_variables(sourceProgram)
+        self.GF = [undefined] * len(self.globalNames)
         self.LFTop = None
         self.LFStack = None
         self.TF = None
-        self.labels = {}
-        self.labels = UniqueDict(self.labels)
         self.varStack = []
         self.instPointerStack = None
-        self.output = None
-
-    def set_all_labels(self):
-        """
-        Checking all the label if they are valid and unique, and stores them to the label array
-        """
-
-        for inst in self.program:
-            if (inst.attrib["opcode"].upper() == "LABEL"):
-                for arg in inst:
-                    try:
-                        self.labels[arg.text] = inst.attrib["order"]
-                    except KeyError:
-                        err_msg("Label '{}' in instruction {} is being redefined".format(arg.text, inst.attrib), SemanticErr)
+        # Taken backward jumps by the index of their target label
+        self.backwardJumps = {}
+        if (output is None):
+            output = OutputWriter(sys.stdout)
+        self.output = output
+        # Stream for DPRINT and BREAK
+        if (errors is None):
+            errors = sys.stderr
+        self.errors = errors
 
     def interpret_the_language(self):
         """
         Interprets the language
         """
 
-        self.set_all_labels()
         self.instructPointer = 0
 
-        while self.instructPointer < len(self.program):
+        program = self.program
+        maxInsts = self.maxInsts
+        if (type(program) is CompiledProgram):
+            self.run_blocks(program.blocks)
+
+        # The rest of the program, when the compiled blocks would exceed the instruction limit
+        while self.instructPointer < len(program):
+            inst = program[self.instructPointer]
+            self.executed += 1
+            if (self.executed > maxInsts):
+                err_msg("Limit of {} executed instructions exceeded in instruction {}".format(maxInsts, inst), InstructionLimitErr)
+            newPointer = inst.handler(self, inst)
 
             # Is it a jump?
-            if (self.program[self.instructPointer].attrib["opcode"] in jumpingInst):
-                self.instructPointer = self.do_instruction(self.program[self.instructPointer])
-            else:
-                self.do_instruction(self.program[self.instructPointer])
+            if (newPointer is not None):
+                self.instructPointer = newPointer
 
             self.instructPointer += 1
         
-        # Write everything to stdout
-        if (self.output != None):
-            for out in self.output:
-                print (out, end='')
+        # Write everything, that is still buffered
+        self.output.close()
         
-    def do_instruction(self, inst):
+    def run_blocks(self, blocks):
         """
-        Perform the instruction
+        Trampoline of the compiled program (--compile), every block returns the index of the next one.
+        When the block would exceed the instruction limit, it stops and the instructions are interpreted one by one.
+
+        Parameters:
+        blocks (list): Blocks by the index of their first instruction (see compile_program)
         """
 
-        def var_arg(inst, whatArg, is_symb=False):
-            """
-            Returns the type and value of the arg <var>
-            """
-            
-            for arg in inst:
-                if (arg.tag == whatArg):
-                    if (arg.text is None):
-                        arg.text = ""
-                    if (arg.attrib["type"] != "var"):
-                        if (is_symb):
-                            return None
-                        err_msg("{} is not valid var name in instruction {}".format(arg.text, inst.attrib),UnexpectedXMLStructureErr)
-                    if (not re.match('^[L,T,G]F@[a-zA-Z_\-\$&%*!?][0-9a-zA-Z_\-\$&%*!?]*$', arg.text)):
-                        if (is_symb):
-                            return None
-                        err_msg("{} is not valid var name in instruction {}".format(arg.text, inst.attrib),UnexpectedXMLStructureErr)
-                    return arg
-            return None
+        program = self.program
+        instructPointer = self.instructPointer
+        maxInsts = self.maxInsts
+        while instructPointer < len(blocks):
+            block = blocks[instructPointer]
+            if (self.executed + block.size > maxInsts):
+                break
+            self.executed += block.size
+            if (block.function is not None):
+                instructPointer = block.function(self)
+            elif (block.entered):
+                block.function = compile_block(program, block)
+                instructPointer = block.function(self)
+            else:
+                block.entered = True
+                instructPointer = self.interpret_block(block)
+        self.instructPointer = instructPointer
 
-        def symb_arg(inst, whatArg):
-            """
-            Returns the type and value of the arg <symb>
-            """
-            
-            var = var_arg(inst, whatArg, is_symb=True)
-            if (var is not None):
-                return "var", var
-            for arg in inst:
-                if (arg.tag == whatArg):
-                    return arg.attrib["type"], arg
+    def interpret_block(self, block):
+        """
+        Interprets the block by the reference handlers, returns the index of the next instruction
+        """
 
-            # didn't fit any format
-            err_msg("The <symb> value is not valid in {} argument".format(arg), UnexpectedXMLStructureErr)
+        program = self.program
+        for index in range(block.start, block.end):
+            inst = program[index]
+            self.instructPointer = index
+            newPointer = opcodeHandlers[inst.opcode](self, inst)
+            if (newPointer is not None):
+                return newPointer + 1
+        return block.end
+
+    def var_arg(self, inst, whatArg):
+        """
+        Returns the arg <var>, it was already checked when the program was loaded
+        """
+        
+        return inst.args[whatArg]
 
-        def label_arg(inst, whatArg):
-            """
-            Returns the valid label from arg <label>
-            """
+    def symb_arg(self, inst, whatArg):
+        """
+        Returns the type and the arg <symb>
+        """
+        
+        arg = inst.args[whatArg]
+        return arg.type, arg
 
-            for arg in inst:
-                if whatArg == arg.tag:
-                    if arg.attrib["type"] != "label":
-                        err_msg("Argument is not a label type in instruction '{}'".format(inst.attrib), UnexpectedXMLStructureErr)
+    def label_arg(self, inst, whatArg):
+        """
+        Returns the instruction index of the arg <label>, it was linked when the program was loaded
+        """
 
-                    return arg.text
+        return inst.args[whatArg].value
+    
+    def new_frame(self):
+        """
+        Returns the temporary frame with no variable defined, it's a list indexed by the local variable slots.
+        The frame grows with DEFVAR, so it takes only the slots up to its last defined variable.
+        """
+
+        return []
+
+    def frame_to_dict(self, varsFrame, varNames):
+        """
+        Returns the defined variables of the frame as the dict (used for printing)
+        """
+
+        if (varsFrame is None):
             return None
-        
-        def search_in_frame(frameType, frameName):
-            """
-            Looks for the variable in frames, and if it's found returns the frame
-            """
+        return {name: str(value) if type(value) is StringBuffer else value
+                for name, value in zip(varNames, varsFrame) if value is not undefined}
 
-            if (frameType == "GF"):
-                try:
-                    self.GF[frameName]
-                except KeyError:
-                    err_msg("Global frame with variable name '{}' doesn't exists", VariableDoesntExistsErr)
-                return self.GF
+    def search_in_frame(self, frameType, slot):
+        """
+        Looks for the variable slot in frames, and if it's defined returns the frame
+        """
 
-            elif frameType == "LF":
-                if (self.LFTop is None):
-                    err_msg("Local frame is not created yet", FrameDoesntExistsErr)
+        if (frameType == "GF"):
+            if (self.GF[slot] is undefined):
+                err_msg("Global frame with variable name '{}' doesn't exists".format(self.globalNames[slot]), VariableDoesntExistsErr)
+            return self.GF
 
-                try:
-                    self.LFTop[frameName]
-                except KeyError:
-                    err_msg("Local frame with variable name '{}' doesn't exists", VariableDoesntExistsErr)
-                return self.LFTop
+        elif frameType == "LF":
+            if (self.LFTop is None):
+                err_msg("Local frame is not created yet", FrameDoesntExistsErr)
 
-            elif frameType == "TF":
-                if (self.TF is None):
-                    err_msg("Temporary frame is not created yet", FrameDoesntExistsErr)
+            if (slot >= len(self.LFTop) or self.LFTop[slot] is undefined):
+                err_msg("Local frame with variable name '{}' doesn't exists".format(self.localNames[slot]), VariableDoesntExistsErr)
+            return self.LFTop
 
-                try:
-                    self.TF[frameName]
-                except KeyError:
-                    err_msg("Temporary frame with variable name '{}' doesn't exists", VariableDoesntExistsErr)
-                return self.TF
+        elif frameType == "TF":
+            if (self.TF is None):
+                err_msg("Temporary frame is not created yet", FrameDoesntExistsErr)
 
-        def get_var(arg, isType=False):
-            """
-            Returns the type and value of the arg <var>
-            """
+            if (slot >= len(self.TF) or self.TF[slot] is undefined):
+                err_msg("Temporary frame with variable name '{}' doesn't exists".format(self.localNames[slot]), VariableDoesntExistsErr)
+            return self.TF
 
-            frame, name = get_frame_and_name(arg)
-            varsFrame = search_in_frame(frame, name)
+    def get_var(self, inst, arg, isType=False, keepBuffer=False):
+        """
+        Returns the type and value of the arg <var>.
+        With keepBuffer the StringBuffer is returned as it is (for the reads, which need only its length or a char).
+        """
 
-            argType = varsFrame[name]['type']
-            argValue = varsFrame[name]['value']
+        frame, slot = self.get_frame_and_name(arg)
+        varsFrame = self.search_in_frame(frame, slot)
 
-            if ((argValue is None or argType is None) and isType == False):
-                err_msg("Uninitialized variable in arg: {}. In instruction: {}".format(arg.tag, inst.attrib), MissingValueErr)
-            return argType, argValue
+        argValue = varsFrame[slot]
+        argType = valueTypes.get(type(argValue))
 
-        def get_type_value(arg, typeOfArg, isType=False):
-            """
-            Returns the type and value of the argument <symb>
-            """
-            
-            if (typeOfArg == "var"):
-                typeOfArg, argValue = get_var(arg, isType)
+        if (argType is None):
+            if (argValue is None):
+                if (isType == False):
+                    err_msg("Uninitialized variable in arg: {}. In instruction: {}".format(arg.text, inst), MissingValueErr)
+            elif (keepBuffer):
+                argType = "string"
             else:
-                argValue = arg.text
-
-            return typeOfArg, argValue
+                # String buffer never leaves its variable, the others get the flat string
+                argType, argValue = "string", str(argValue)
+        return argType, argValue
 
-        def get_frame_and_name(arg):
-            """
-            Returns the frame and name of the argument
-            """
+    def get_type_value(self, inst, arg, typeOfArg, isType=False, keepBuffer=False):
+        """
+        Returns the type and value of the argument <symb>
+        """
+        
+        if (typeOfArg == "var"):
+            typeOfArg, argValue = self.get_var(inst, arg, isType, keepBuffer)
+        else:
+            argValue = arg.value
 
-            arg_split = arg.text.split('@', 1)
-            frame = arg_split[0]
-            name = arg_split[1]
+        return typeOfArg, argValue
 
-            return (frame, name)
+    def get_frame_and_name(self, arg):
+        """
+        Returns the frame and the slot of the argument, they are resolved when the program is loaded
+        """
 
-        def get_var_symb_symb():
-            """
-            Returns the crusial variables needed in <var><symb><symb> instructions
-            """
+        return (arg.frame, arg.value)
 
-            arg1 = var_arg(inst, "arg1")
-            
-            frame, name = get_frame_and_name(arg1)
-            varsFrame = search_in_frame(frame, name)
+    def get_var_symb_symb(self, inst, keepBuffer=False):
+        """
+        Returns the crusial variables needed in <var><symb><symb> instructions,
+        with keepBuffer the StringBuffer in arg2 is not flattened (see get_var)
+        """
 
-            arg2Type, arg2Body = symb_arg(inst, "arg2")
-            arg2Type, arg2Value = get_type_value(arg2Body, arg2Type)
+        arg1 = self.var_arg(inst, 0)
+        
+        frame, slot = self.get_frame_and_name(arg1)
+        varsFrame = self.search_in_frame(frame, slot)
 
-            arg3Type, arg3Body = symb_arg(inst, "arg3")
-            arg3Type, arg3Value = get_type_value(arg3Body, arg3Type)
+        arg2Type, arg2Body = self.symb_arg(inst, 1)
+        arg2Type, arg2Value = self.get_type_value(inst, arg2Body, arg2Type, keepBuffer=keepBuffer)
 
-            if (arg2Type is None or arg3Type is None):
-                err_msg("Uninitialized variabel in arg2 or arg3 in instruction {}".format(inst.attrib),MissingValueErr)
+        arg3Type, arg3Body = self.symb_arg(inst, 2)
+        arg3Type, arg3Value = self.get_type_value(inst, arg3Body, arg3Type)
 
-            return name, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value
+        if (arg2Type is None or arg3Type is None):
+            err_msg("Uninitialized variabel in arg2 or arg3 in instruction {}".format(inst),MissingValueErr)
 
-        def aritmetic_operations():
-            """
-            Do setup for aritmetic operations
-            """
+        return slot, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value
 
-            name, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = get_var_symb_symb()
+    def aritmetic_operations(self, inst):
+        """
+        Do setup for aritmetic operations
+        """
 
-            if (arg2Type is None or arg3Type is None):
-                err_msg("Value in one or more instruction arguments are not defined, Instruction: {}".format(inst.attrib), MissingValueErr)
+        slot, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = self.get_var_symb_symb(inst)
 
-            if (arg2Type != "int" or arg3Type != "int"):
-                err_msg("Arguments have to be type of 'int' in instruction {}".format(inst.attrib), WrongOperandTypeErr)
-            
-            try:
-                arg2Value = int(arg2Value)
-                arg3Value = int(arg3Value)
-            except TypeError:
-                err_msg("Cannot convert value to int type in instruction {}".format(inst.attrib), InternalErr)
+        if (arg2Type is None or arg3Type is None):
+            err_msg("Value in one or more instruction arguments are not defined, Instruction: {}".format(inst), MissingValueErr)
 
-            return (arg2Value, arg3Value, varsFrame, name)
+        if (arg2Type != "int" or arg3Type != "int"):
+            err_msg("Arguments have to be type of 'int' in instruction {}".format(inst), WrongOperandTypeErr)
 
-        
-        def convert_unicode_values_in_string(string):
-            """
-            Converts every unicode sequence in string to the coresponding character
-            """
+        return (arg2Value, arg3Value, varsFrame, slot)
 
-            for unicode_sequence in re.findall('\\\\[0-9]{3}', string):
-                string = string.replace(unicode_sequence, chr(int(unicode_sequence[1:])))
-            return string
 
-        def defvar():
-            """
-            Defines the arg1 variable
-            """
+    def defvar(self, inst):
+        """
+        Defines the arg1 variable
+        """
 
-            arg1 = var_arg(inst, "arg1")
+        arg1 = self.var_arg(inst, 0)
 
-            frame, name = get_frame_and_name(arg1)
+        frame, slot = self.get_frame_and_name(arg1)
+        name = arg1.name
 
-            if (frame == "GF"):
-                if (name in self.GF.keys()):
-                    err_msg("Global frame {} is being redefined".format(name), SemanticErr)
-                else:
-                    self.GF[name] = {'type': None, 'value': None}
-            elif (frame == "LF"):
-                if type(self.LFTop) == dict:
-                    if (name in self.LFTop.keys()):
-                        err_msg("Local frame {} is being redefined".format(name), SemanticErr)
-                    else:
-                        self.LFTop[name] = {'type': None, 'value': None}
+        if (frame == "GF"):
+            if (self.GF[slot] is not undefined):
+                err_msg("Global frame {} is being redefined".format(name), SemanticErr)
+            else:
+                self.GF[slot] = None
+        elif (frame == "LF"):
+            if (self.LFTop is not None):
+                self.grow_frame(self.LFTop, slot)
+                if (self.LFTop[slot] is not undefined):
+                    err_msg("Local frame {} is being redefined".format(name), SemanticErr)
                 else:
-                    err_msg("Local frame with name '{}' is not created".format(name), FrameDoesntExistsErr)
-            
-            elif (frame == "TF"):
-                if (type(self.TF) == dict):
-                    if (name in self.TF.keys()):
-                        err_msg("Temporary frame {} is being redefined".format(name), SemanticErr)
-                    else:
-                        self.TF[name] = {'type': None, 'value': None}
+                    self.LFTop[slot] = None
+            else:
+                err_msg("Local frame with name '{}' is not created".format(name), FrameDoesntExistsErr)
+
+        elif (frame == "TF"):
+            if (self.TF is not None):
+                self.grow_frame(self.TF, slot)
+                if (self.TF[slot] is not undefined):
+                    err_msg("Temporary frame {} is being redefined".format(name), SemanticErr)
                 else:
-                    err_msg("Temporary frame with name '{}' is not created".format(name), FrameDoesntExistsErr)
+                    self.TF[slot] = None
+            else:
+                err_msg("Temporary frame with name '{}' is not created".format(name), FrameDoesntExistsErr)
+
+    def grow_frame(self, varsFrame, slot):
+        """
+        Extends the local or temporary frame, so it has the slot
+        """
 
-        def move():
-            """
-            Copies the arg2 value to the arg1 variable
-            """
+        if (slot >= len(varsFrame)):
+            varsFrame.extend([undefined] * (slot + 1 - len(varsFrame)))
 
-            arg1 = var_arg(inst, "arg1")
+    def move(self, inst):
+        """
+        Copies the arg2 value to the arg1 variable
+        """
 
-            frame, name = get_frame_and_name(arg1)
-            varsFrame = search_in_frame(frame, name)
+        arg1 = self.var_arg(inst, 0)
 
-            arg2Type, arg2Body = symb_arg(inst, "arg2")
+        frame, slot = self.get_frame_and_name(arg1)
+        varsFrame = self.search_in_frame(frame, slot)
 
-            if (arg2Body is None):
-                err_msg("Value of arg2 is empty in instruction {}".format(inst.attrib), UnexpectedXMLStructureErr)
+        arg2Type, arg2Body = self.symb_arg(inst, 1)
 
-            if (arg2Type == "int"):
-                argStruct = {'type': 'int', 'value': int(arg2Body.text)}
-            elif (arg2Type == "var"):
-                arg2Type, arg2Value = get_var(arg2Body)
-                argStruct = {'type': arg2Type, 'value': arg2Value}
-            else:
-                argStruct = {'type': arg2Type, 'value': arg2Body.text}
+        if (arg2Body is None):
+            err_msg("Value of arg2 is empty in instruction {}".format(inst), UnexpectedXMLStructureErr)
 
-            varsFrame[name] = argStruct
+        if (arg2Type == "var"):
+            arg2Type, arg2Value = self.get_var(inst, arg2Body)
+        else:
+            arg2Value = arg2Body.value
 
-        def add():
-            """
-            Performs add on arg2 and arg3 values and stores it to arg1 variable
-            """
+        varsFrame[slot] = arg2Value
 
-            arg2Value, arg3Value, varsFrame, name = aritmetic_operations()
+    def add(self, inst):
+        """
+        Performs add on arg2 and arg3 values and stores it to arg1 variable
+        """
 
-            resultOfAdition = {'type': 'int', 'value': arg2Value + arg3Value}
+        arg2Value, arg3Value, varsFrame, slot = self.aritmetic_operations(inst)
 
-            varsFrame[name] = resultOfAdition
+        result = arg2Value + arg3Value
 
-        def mul():
-            """
-            Performs mul on arg2 and arg3 values and stores it to arg1 variable
-            """
+        varsFrame[slot] = result
 
-            arg2Value, arg3Value, varsFrame, name = aritmetic_operations()
+    def mul(self, inst):
+        """
+        Performs mul on arg2 and arg3 values and stores it to arg1 variable
+        """
 
-            resultOfAdition = {'type': 'int', 'value': arg2Value * arg3Value}
+        arg2Value, arg3Value, varsFrame, slot = self.aritmetic_operations(inst)
 
-            varsFrame[name] = resultOfAdition
+        result = arg2Value * arg3Value
 
-        def sub():
-            """
-            Performs sub on arg2 and arg3 values and stores it to arg1 variable
-            """
+        varsFrame[slot] = result
 
-            arg2Value, arg3Value, varsFrame, name = aritmetic_operations()
+    def sub(self, inst):
+        """
+        Performs sub on arg2 and arg3 values and stores it to arg1 variable
+        """
 
-            resultOfAdition = {'type': 'int', 'value': arg2Value - arg3Value}
+        arg2Value, arg3Value, varsFrame, slot = self.aritmetic_operations(inst)
 
-            varsFrame[name] = resultOfAdition
+        result = arg2Value - arg3Value
 
-        def idiv():
-            """
-            Performs idiv on arg2 and arg3 values and stores it to arg1 variable
-            """
+        varsFrame[slot] = result
 
-            arg2Value, arg3Value, varsFrame, name = aritmetic_operations()
+    def idiv(self, inst):
+        """
+        Performs idiv on arg2 and arg3 values and stores it to arg1 variable
+        """
 
-            if (arg3Value == 0):
-                err_msg("Zero division in {}".format(inst.attrib), WrongOperandValue)
+        arg2Value, arg3Value, varsFrame, slot = self.aritmetic_operations(inst)
 
-            resultOfAdition = {'type': 'int', 'value': arg2Value // arg3Value}
+        if (arg3Value == 0):
+            err_msg("Zero division in {}".format(inst), WrongOperandValue)
 
-            varsFrame[name] = resultOfAdition
+        result = arg2Value // arg3Value
 
-        def write():
-            """
-            Writes the arg1 value to the output array, which is printed at the end
-            """
+        varsFrame[slot] = result
 
-            arg1Type, arg1 = symb_arg(inst, "arg1")
+    def write(self, inst):
+        """
+        Writes the arg1 value to the output array, which is printed at the end
+        """
 
-            if (arg1Type == "var"):
-                arg1Type, arg1Value = get_var(arg1)
-                if (arg1Type is None):
-                    err_msg("Variable is uninitialized in instruction {}".format(inst.attrib), VariableDoesntExistsErr)
-            else:
-                arg1Value = arg1.text
+        arg1Type, arg1 = self.symb_arg(inst, 0)
 
-            if (arg1Value == "nil" and arg1Type == "nil"):
-                arg1Value = ""
+        if (arg1Type == "var"):
+            arg1Type, arg1Value = self.get_var(inst, arg1)
+            if (arg1Type is None):
+                err_msg("Variable is uninitialized in instruction {}".format(inst), VariableDoesntExistsErr)
+        else:
+            arg1Value = arg1.value
 
-            if (self.output == None):
-                self.output = []
+        self.output.write(value_to_str(arg1Value))
 
-            if (type(arg1Value) == str):
-                self.output.append(convert_unicode_values_in_string(arg1Value))
-            else:
-                self.output.append(arg1Value)
 
+    def _read(self, inst):
+        """
+        Reads from input and stores it if
+        1) the arg2 type is same as readed
+        Stores it to the arg1 variable
+        If anything went wrong nil@nil is stored
+        """
 
-        def _read():
-            """
-            Reads from input and stores it if
-            1) the arg2 type is same as readed
-            Stores it to the arg1 variable
-            If anything went wrong nil@nil is stored
-            """
+        arg1 = self.var_arg(inst, 0)
 
-            arg1 = var_arg(inst, "arg1")
+        frame, slot = self.get_frame_and_name(arg1)
+        varsFrame = self.search_in_frame(frame, slot)
 
-            frame, name = get_frame_and_name(arg1)
-            varsFrame = search_in_frame(frame, name)
+        readValue = self.input.read_line()
 
-            readType = None
+        arg = inst.args[1]
+        defaultValue = nil
 
-            if (self.input is None):
-                try:
-                    readValue = input()
-                except EOFError:  
-                    readValue = None
+        if (readValue is None):
+            readValue = defaultValue
+        elif(arg.text == "int"):
+            if (not intPattern.match(readValue)):        # Not supported int value
+                readValue = defaultValue
             else:
-                if type(self.input) != list:
-                    self.input = self.input.splitlines()
-
-                if type(self.input) == list:
-                    if len(self.input) == 0:
-                        readValue = None
-                    else:
-                        readValue = self.input.pop(0)
-            for arg in inst:
-                if (arg.tag == "arg2"):
-                    defaultValue = "nil"
-                    defaultType = "nil"
-
-                    if (arg.attrib["type"] != "type"):
-                        err_msg("Argument type in argument {} have to be 'type'... Instruction: {}".format(arg.attrib, inst.attrib))
-                    if (readValue is None):
-                        readValue = defaultValue
-                        readType = defaultType
-                    elif (arg.text == "string"):
-                        readType = "string"
-                    elif(arg.text == "int"):
-                        readType = "int"
-                        if (not re.match('^(\+|-|)[0-9]+$', readValue)):        # Not supported int value
-                            readValue = defaultValue
-                            readType = defaultType
-                    elif(arg.text == "bool"):
-                        readType = "bool"
-                        readValue = readValue.upper()
-                        if (not re.match('^(TRUE)$', readValue)):
-                            readValue = "false"
-                        else:
-                            readValue = "true"  
-                    else:
-                        readValue = defaultValue
-                        readType = defaultType
-            
-            argStruct = {'type': readType, 'value': readValue}
-            varsFrame[name] = argStruct
+                readValue = int(readValue)
+        elif(arg.text == "bool"):
+            readValue = readValue.upper() == "TRUE"
+        elif (arg.text != "string"):
+            readValue = defaultValue
+        
+        varsFrame[slot] = readValue
 
-        def create_frame():
-            """
-            Creates the TF frame
-            """
+    def create_frame(self, inst):
+        """
+        Creates the TF frame
+        """
 
-            self.TF = {}
+        self.TF = self.new_frame()
 
-        def push_frame():
-            """
-            Pushs the TF frame and stores it to the LF
-            """
+    def push_frame(self, inst):
+        """
+        Pushs the TF frame and stores it to the LF
+        """
 
-            if (self.TF is None):
-                err_msg("The temporary frame doesn't exists", FrameDoesntExistsErr)
+        if (self.TF is None):
+            err_msg("The temporary frame doesn't exists", FrameDoesntExistsErr)
 
-            if (self.LFStack is None):
-                self.LFStack = []
+        if (self.LFStack is None):
+            self.LFStack = []
 
-            self.LFStack.append(self.TF)
-            self.TF = None
-            self.LFTop = self.LFStack[len(self.LFStack) -1]
+        self.LFStack.append(self.TF)
+        self.TF = None
+        self.LFTop = self.LFStack[len(self.LFStack) -1]
 
-        def pop_frame():
-            """
-            Pops the LF frame and stores it to the TF
-            """
+    def pop_frame(self, inst):
+        """
+        Pops the LF frame and stores it to the TF
+        """
 
-            if (self.LFStack is None):
-                err_msg("There is no local frame left to be poped", FrameDoesntExistsErr)
+        if (self.LFStack is None):
+            err_msg("There is no local frame left to be poped", FrameDoesntExistsErr)
+        if (len(self.LFStack) > 0):
+            self.TF = self.LFStack.pop()
             if (len(self.LFStack) > 0):
-                self.TF = self.LFStack.pop()
-                if (len(self.LFStack) > 0):
-                    self.LFTop = self.LFStack[len(self.LFStack) -1]
-                elif (len(self.LFStack) == 0):
-                    self.LFTop = None
-            else:
-                err_msg("There is no local frame left to be poped", FrameDoesntExistsErr)
+                self.LFTop = self.LFStack[len(self.LFStack) -1]
+            elif (len(self.LFStack) == 0):
+                self.LFTop = None
+        else:
+            err_msg("There is no local frame left to be poped", FrameDoesntExistsErr)
 
-        def label():
-            """
-            Does nothing, because the label are already done at the beginning
-            """
+    def label(self, inst):
+        """
+        Does nothing, because the labels are already linked when the program is loaded
+        """
 
-            # Already done in the beginnig
-            return
-        
-        def jump():
-            """
-            Perform jump in instruction counter
-            """
+        # Already done in the beginnig
+        return
+    
+    def jump(self, inst):
+        """
+        Perform jump in instruction counter
+        """
 
-            jumpingOn = label_arg(inst, "arg1")
+        return self.taken_jump(self.label_arg(inst, 0))
 
-            if (jumpingOn in self.labels.keys()):
-                try:
-                    jumpingOn = int(self.labels[jumpingOn]) - 1
-                except TypeError:
-                    err_msg("Cannot convert value to int type in instruction {}".format(inst.attrib), InternalErr)
-                return jumpingOn
-            else:
-                err_msg("Undefined label with name '{}'".format(jumpingOn), SemanticErr)
+    def taken_jump(self, target):
+        """
+        Returns the target of the taken jump. The backward jumps are counted and when the loop
+        gets hot, its body is specialized by the observed operand types.
+        """
 
-        def jumpifeq():
-            """
-            Perform jump in instruction counter if arg2 and arg3 are equal
-            """
+        if (target < self.instructPointer):
+            count = self.backwardJumps.get(target, 0) + 1
+            self.backwardJumps[target] = count
+            if (count == hotLoopThreshold):
+                self.specialize_loop(target, self.instructPointer)
+        return target
 
-            jumpingOn = label_arg(inst, "arg1")
+    def specialize_loop(self, start, end):
+        """
+        Gives the instructions of the hot loop (start..end) the handlers specialized by the current types
+        of their operands (see guarded_handler). Only the instructions with the reference handlers
+        and with the GF variables and constants are specialized.
 
-            if (jumpingOn in self.labels.keys()):
-                try:
-                    jumpingOn = int(self.labels[jumpingOn]) - 1
-                except TypeError:
-                    err_msg("Cannot convert value to int type in instruction {}".format(inst.attrib), InternalErr)
-            else:
-                err_msg("Undefined label with name '{}'".format(jumpingOn), SemanticErr)
+        Parameters:
+        start (int): Index of the LABEL of the loop
+        end (int): Index of the jump back to the LABEL
+        """
 
-            arg2Type, arg2Body = symb_arg(inst, "arg2")
-            arg2Type, arg2Value = get_type_value(arg2Body, arg2Type)
+        program = self.program
+        for index in range(start, end + 1):
+            inst = program[index]
+            if (inst.handler is not opcodeHandlers[inst.opcode] or len(inst.args) < 2):
+                continue
+
+            args = inst.args
+            if (inst.opcode not in ("JUMPIFEQ", "JUMPIFNEQ")):
+                if (args[0].type != "var" or args[0].frame != "GF" or self.GF[args[0].value] is undefined):
+                    continue
+            types = []
+            for arg in args[1:]:
+                if (arg.type != "var"):
+                    types.append(arg.type)
+                elif (arg.frame == "GF"):
+                    types.append(valueTypes.get(type(self.GF[arg.value])))
+                else:
+                    types.append(None)
 
-            arg3Type, arg3Body = symb_arg(inst, "arg3")
-            arg3Type, arg3Value = get_type_value(arg3Body, arg3Type)
+            typedHandler = typedHandlers.get((inst.opcode, tuple(types)))
+            if (typedHandler is not None):
+                specialized = Instruction(inst.opcode, inst.order, args)
+                specialized.handler = guarded_handler(inst, typedHandler, types)
+                program[index] = specialized
 
-            if (arg2Type is None or arg3Type is None):
-                err_msg("Value in one or more instruction arguments are not defined, Instruction: {}".format(inst.attrib), MissingValueErr)
+    def operands_are_equal(self, inst):
+        """
+        Compares the arg2 and arg3 values of JUMPIFEQ and JUMPIFNEQ
+        """
 
-            # Convert
-            if (arg2Type == "string" and arg3Type == "string"):
-                arg2Value = convert_unicode_values_in_string(arg2Value)
-                arg3Value = convert_unicode_values_in_string(arg3Value)
-            elif (arg2Type == "int" and arg3Type == "int"):
-                try:
-                    arg2Value = int(arg2Value)
-                    arg3Value = int(arg3Value)
-                except TypeError:
-                    err_msg("Cannot convert value to int type in instruction {}".format(inst.attrib), InternalErr)
-
-            if (arg2Type != arg3Type and arg2Type != "nil" and arg3Type != "nil"):
-                err_msg("Operands cannot be compared in instruction '{}'".format(inst.attrib), WrongOperandTypeErr)
-            elif (arg2Type == "nil" and arg3Type == "nil"):
-                doJump = True
-            else:
-                doJump = arg2Value == arg3Value
+        arg2Type, arg2Body = self.symb_arg(inst, 1)
+        arg2Type, arg2Value = self.get_type_value(inst, arg2Body, arg2Type)
 
-            if (doJump):
-                return jumpingOn
-            else:
-                return self.instructPointer
+        arg3Type, arg3Body = self.symb_arg(inst, 2)
+        arg3Type, arg3Value = self.get_type_value(inst, arg3Body, arg3Type)
 
-        def jumpifneq():
-            """
-            Perform jump in instruction counter if arg2 and arg3 are not equal
-            """
+        if (arg2Type is None or arg3Type is None):
+            err_msg("Value in one or more instruction arguments are not defined, Instruction: {}".format(inst), MissingValueErr)
 
-            jumpingOn = label_arg(inst, "arg1")
-            doJump = jumpifeq()
-            jumpingOn = int(self.labels[jumpingOn]) - 1
+        if (arg2Type != arg3Type and arg2Type != "nil" and arg3Type != "nil"):
+            err_msg("Operands cannot be compared in instruction '{}'".format(inst), WrongOperandTypeErr)
+        elif (arg2Type == "nil" or arg3Type == "nil"):
+            return arg2Type == arg3Type
+        return arg2Value == arg3Value
 
-            # Invert jumpifeq
-            if (doJump != self.instructPointer):    # EQ would jump
-                return self.instructPointer     # NEQ won't
-            else:
-                return jumpingOn
+    def jumpifeq(self, inst):
+        """
+        Perform jump in instruction counter if arg2 and arg3 are equal
+        """
 
-        def _type():
-            """
-            Stores the type of the arg2 to the arg1 variable
-            """
+        if (self.operands_are_equal(inst)):
+            return self.taken_jump(self.label_arg(inst, 0))
 
-            arg1 = var_arg(inst, "arg1")    
+    def jumpifneq(self, inst):
+        """
+        Perform jump in instruction counter if arg2 and arg3 are not equal
+        """
 
-            frame, name = get_frame_and_name(arg1)
-            varsFrame = search_in_frame(frame, name)  
+        if (not self.operands_are_equal(inst)):
+            return self.taken_jump(self.label_arg(inst, 0))
 
-            arg2Type, arg2Body = symb_arg(inst, "arg2")
-            arg2Type, arg2Value = get_type_value(arg2Body, arg2Type, isType=True)
+    def _type(self, inst):
+        """
+        Stores the type of the arg2 to the arg1 variable
+        """
 
-            if arg2Type is None:
-                arg2Type = ""
+        arg1 = self.var_arg(inst, 0)    
 
-            argStruct = {'type': 'string', 'value': arg2Type}
-            varsFrame[name] = argStruct
+        frame, slot = self.get_frame_and_name(arg1)
+        varsFrame = self.search_in_frame(frame, slot)  
 
-        def _exit():
-            """
-            Exits the program with arg1 exit code
-            Prints the output which should be printed before exiting
-            """
+        arg2Type, arg2Body = self.symb_arg(inst, 1)
+        arg2Type, arg2Value = self.get_type_value(inst, arg2Body, arg2Type, isType=True)
 
-            arg1Type, arg1Body = symb_arg(inst, "arg1")
-            arg1Type, arg1Value = get_type_value(arg1Body, arg1Type)
+        if arg2Type is None:
+            arg2Type = ""
 
-            if (arg1Type is None):
-                err_msg("Uninitialized variable in {}".format(inst.attrib), MissingValueErr)
+        varsFrame[slot] = arg2Type
 
-            if (arg1Type != "int"):
-                err_msg("Exit value can be only 'int' type", WrongOperandTypeErr)
+    def _exit(self, inst):
+        """
+        Exits the program with arg1 exit code
+        Prints the output which should be printed before exiting
+        """
 
-            try:
-                exitCode = int(arg1Value)
-            except TypeError:
-                err_msg("Cannot convert value to int type in instruction {}".format(inst.attrib), InternalErr)
-
-            if (0 <= exitCode <= 49):
-                # Write if anything should be writen before exit
-                if (self.output is not None):
-                    for out in self.output:
-                        print (out, end='')
-                sys.exit(exitCode)
-            else:
-                err_msg("Exit code cannot be lower than 0 nor bigger than 49", WrongOperandValue)
+        arg1Type, arg1Body = self.symb_arg(inst, 0)
+        arg1Type, arg1Value = self.get_type_value(inst, arg1Body, arg1Type)
 
-        def pushs():
-            """
-            Push the arg1 <symb> to the varStack
-            """
+        if (arg1Type is None):
+            err_msg("Uninitialized variable in {}".format(inst), MissingValueErr)
 
-            arg1Type, arg1Body = symb_arg(inst, "arg1")
-            arg1Type, arg1Value = get_type_value(arg1Body, arg1Type)
+        if (arg1Type != "int"):
+            err_msg("Exit value can be only 'int' type", WrongOperandTypeErr)
 
-            if (arg1Type is None):
-                err_msg("Uninitialized variable cannot be pushed... Instruction {}".format(inst.attrib), MissingValueErr)
+        exitCode = arg1Value
 
-            varToBePushed = {'type': arg1Type, 'value': arg1Value}
-            self.varStack.append(varToBePushed)
+        if (0 <= exitCode <= 49):
+            # Write if anything should be writen before exit
+            self.output.close()
+            raise ProgramExit(exitCode)
+        else:
+            err_msg("Exit code cannot be lower than 0 nor bigger than 49", WrongOperandValue)
 
-        def pops():
-            """
-            Pops the arg1 <symb> from the varStack
-            """
+    def pushs(self, inst):
+        """
+        Push the arg1 <symb> to the varStack
+        """
 
-            if (len(self.varStack) < 1):
-                err_msg("Empty stack cannot be poped in instruction {}".format(inst.attrib), MissingValueErr)
-            arg1 = var_arg(inst, "arg1")
+        arg1Type, arg1Body = self.symb_arg(inst, 0)
+        arg1Type, arg1Value = self.get_type_value(inst, arg1Body, arg1Type)
 
-            frame, name = get_frame_and_name(arg1)
-            varsFrame = search_in_frame(frame, name)
+        if (arg1Type is None):
+            err_msg("Uninitialized variable cannot be pushed... Instruction {}".format(inst), MissingValueErr)
 
-            varToBePoped = self.varStack.pop()
-            varsFrame[name] = varToBePoped
+        self.varStack.append(arg1Value)
 
-        def int2char():
-            """
-            Convert the int from arg2 value to the string and stores it to the arg1 variable
-            """
+    def pops(self, inst):
+        """
+        Pops the arg1 <symb> from the varStack
+        """
 
-            arg1 = var_arg(inst, "arg1")
+        if (len(self.varStack) < 1):
+            err_msg("Empty stack cannot be poped in instruction {}".format(inst), MissingValueErr)
+        arg1 = self.var_arg(inst, 0)
 
-            frame, name = get_frame_and_name(arg1)
-            varsFrame = search_in_frame(frame, name)
+        frame, slot = self.get_frame_and_name(arg1)
+        varsFrame = self.search_in_frame(frame, slot)
 
-            arg2Type, arg2Body = symb_arg(inst, "arg2")
-            arg2Type, arg2Value = get_type_value(arg2Body, arg2Type)
+        varToBePoped = self.varStack.pop()
+        varsFrame[slot] = varToBePoped
 
-            if (arg2Value is None):
-                err_msg("Uninitialized value of integer in instruction {}".format(inst.attrib), MissingValueErr)
+    def pop_operands(self, inst, count):
+        """
+        Pops the operands of the stack instruction, the first operand is the deepest one
 
-            if (arg2Type != "int"):
-                err_msg("arg2 value can be only 'int' type", WrongOperandTypeErr)
-            
-            try:
-                arg2Value = int(arg2Value)
-            except TypeError:
-                err_msg("Cannot convert value to int type in instruction {}".format(inst.attrib), InternalErr)
-            
-            try:
-                converted = chr(arg2Value)
-            except ValueError:
-                err_msg("The value in instruction cannot be converted... Instruction: {}".format(inst.attrib), StringOperationErr)
+        Parameters:
+        inst (Instruction): Stack instruction
+        count (int): Number of the operands
+        """
 
-            argStruct = {'type': 'string', 'value': converted}
-            varsFrame[name] = argStruct
+        if (len(self.varStack) < count):
+            err_msg("Not enough values on the stack in instruction {}".format(inst), MissingValueErr)
+        operands = self.varStack[-count:]
+        del self.varStack[-count:]
+        return operands
 
-        def stri2int():
-            """
-            Convert the string from arg2 value at arg3 index to the int and stores it to the arg1 variable
-            """
+    def stack_aritmetic_operations(self, inst):
+        """
+        Do setup for aritmetic operations on the stack
+        """
 
-            name, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = get_var_symb_symb()
+        arg1Value, arg2Value = self.pop_operands(inst, 2)
+        if (type(arg1Value) is not int or type(arg2Value) is not int):
+            err_msg("Operands have to be type of 'int' in instruction {}".format(inst), WrongOperandTypeErr)
+        return arg1Value, arg2Value
 
-            if (arg2Type == "string"):
-                arg2Value = convert_unicode_values_in_string(arg2Value)
-            else:
-                err_msg("The second argument is not a string in {}".format(inst.attrib), WrongOperandTypeErr)
+    def stack_relation_operands(self, inst):
+        """
+        Do setup for LTS and GTS, both operands have to be the same int, string or bool type
+        """
 
-            if (arg3Type != "int"):
-                err_msg("The third argument is not an int in {}".format(inst.attrib), WrongOperandTypeErr)
+        arg1Value, arg2Value = self.pop_operands(inst, 2)
+        if (type(arg1Value) is not type(arg2Value) or type(arg1Value) not in (int, str, bool)):
+            err_msg("Operand types are not supported in {} instruction".format(inst.opcode), WrongOperandTypeErr)
+        return arg1Value, arg2Value
 
-            try:
-                arg3Value = int(arg3Value)
-            except TypeError:
-                err_msg("Cannot convert value to int type in instruction {}".format(inst.attrib), InternalErr)
+    def stack_operands_are_equal(self, inst):
+        """
+        Pops and compares the two operands of EQS, JUMPIFEQS and JUMPIFNEQS
+        """
 
-            if (int(arg3Value) < 0):
-                err_msg("Negative number in index in instruction {}".format(inst.attrib), StringOperationErr)
-            
-            try:
-                argStruct = {'type': 'int', 'value': ord(arg2Value[arg3Value])}
-            except:
-                err_msg("Function ord() exception caught in instruction {}".format(inst.attrib), StringOperationErr)
-            varsFrame[name] = argStruct
-
-        def _return():
-            """
-            Returns to the previous CALL instruction
-            """
-
-            if (self.instPointerStack is None or len(self.instPointerStack) < 1):
-                err_msg("Return called without previos CALL instruction", MissingValueErr)
-            else:
-                return self.instPointerStack.pop()
+        arg1Value, arg2Value = self.pop_operands(inst, 2)
+        if (arg1Value is nil or arg2Value is nil):
+            return arg1Value is arg2Value
+        if (type(arg1Value) is not type(arg2Value)):
+            err_msg("Operands cannot be compared in instruction '{}'".format(inst), WrongOperandTypeErr)
+        return arg1Value == arg2Value
 
-        def call():
-            """
-            Jumping on the arg1 label, and storing the instruction pointer of the CALL for RETURN inst
-            """
+    def stack_bool_operands(self, inst, count):
+        """
+        Do setup for ANDS, ORS and NOTS, all operands have to be bool
+        """
 
-            callingLabel = label_arg(inst, "arg1")
+        operands = self.pop_operands(inst, count)
+        for value in operands:
+            if (type(value) is not bool):
+                err_msg("One of the operands are not bool in instruction {}".format(inst), WrongOperandTypeErr)
+        return operands
 
-            if (callingLabel in self.labels.keys()):
-                if (self.instPointerStack is None):
-                    self.instPointerStack = []
-                try:
-                    int(inst.attrib["order"])
-                except TypeError:
-                    err_msg("Cannot convert value to int type in instruction {}".format(inst.attrib), InternalErr)
+    def clears(self, inst):
+        """
+        Removes all values from the varStack
+        """
 
-                self.instPointerStack.append(int(inst.attrib["order"]))
-                return (int(self.labels[callingLabel]) -1)
-            else:
-                err_msg("Undefined label in CALL instruction... Instruction: {}".format(inst.attrib), SemanticErr)
+        self.varStack.clear()
 
-        def _break():
-            """
-            Prints the current instruction, all frames and how many instructions were executed already
-            """
+    def adds(self, inst):
+        """
+        Pops two values, performs add on them and pushes the result
+        """
 
-            print("Break instruction executed as {}. in order".format(inst.attrib["order"]),file=sys.stderr)
-            print("GF: {}".format(self.GF),file=sys.stderr)
-            print("LF: {}".format(self.LFTop),file=sys.stderr)
-            print("TF: {}".format(self.TF),file=sys.stderr)
-            print("Instructions already executed: {}".format(inst.attrib["order"] - 1),file=sys.stderr)
+        arg1Value, arg2Value = self.stack_aritmetic_operations(inst)
+        self.varStack.append(arg1Value + arg2Value)
 
-        def dprint():
-            """
-            Prints the value of arg1 to the stderr
-            """
+    def subs(self, inst):
+        """
+        Pops two values, performs sub on them and pushes the result
+        """
 
-            arg1Type, arg1Body = symb_arg(inst, "arg1")
-            arg1Type, arg1Value = get_type_value(arg1Body, arg1Type)
+        arg1Value, arg2Value = self.stack_aritmetic_operations(inst)
+        self.varStack.append(arg1Value - arg2Value)
 
-            if (arg1Type == "nil" and arg1Value == "nil"):
-                arg1Value = ""
+    def muls(self, inst):
+        """
+        Pops two values, performs mul on them and pushes the result
+        """
 
-            if (type(arg1Value) == str):
-                print(convert_unicode_values_in_string(arg1Value), end='', file=sys.stderr)
-            else:
-                print(arg1Value, end='', file=sys.stderr)
+        arg1Value, arg2Value = self.stack_aritmetic_operations(inst)
+        self.varStack.append(arg1Value * arg2Value)
 
-        def strlen():
-            """
-            Stores the length of string in arg2 to the arg1 variable
-            """
+    def idivs(self, inst):
+        """
+        Pops two values, performs idiv on them and pushes the result
+        """
 
-            arg1 = var_arg(inst, "arg1")
+        arg1Value, arg2Value = self.stack_aritmetic_operations(inst)
+        if (arg2Value == 0):
+            err_msg("Zero division in {}".format(inst), WrongOperandValue)
+        self.varStack.append(arg1Value // arg2Value)
 
-            frame, name = get_frame_and_name(arg1)
-            varsFrame = search_in_frame(frame, name)
+    def lts(self, inst):
+        """
+        Pops two values, performs the 'less than' (<) operation and pushes the result
+        """
 
-            arg2Type, arg2Body = symb_arg(inst, "arg2")
-            arg2Type, arg2Value = get_type_value(arg2Body, arg2Type)
+        arg1Value, arg2Value = self.stack_relation_operands(inst)
+        self.varStack.append(arg1Value < arg2Value)
 
-            if (arg2Type == "string"):
-                arg2Value = convert_unicode_values_in_string(arg2Value)
-            else:
-                err_msg("The second argument is not a string in {}".format(inst.attrib), WrongOperandTypeErr)
+    def gts(self, inst):
+        """
+        Pops two values, performs the 'greater than' (>) operation and pushes the result
+        """
 
-            argStruct = {'type': 'int', 'value': len(arg2Value)}
+        arg1Value, arg2Value = self.stack_relation_operands(inst)
+        self.varStack.append(arg1Value > arg2Value)
 
-            varsFrame[name] = argStruct
+    def eqs(self, inst):
+        """
+        Pops two values, performs the 'equal' (==) operation and pushes the result
+        """
 
-        def _not():
-            """
-            Performs NOT operation on arg2 bool value and stores it to arg1 variable
-            """
+        self.varStack.append(self.stack_operands_are_equal(inst))
 
-            arg1 = var_arg(inst, "arg1")
+    def ands(self, inst):
+        """
+        Pops two values, performs the 'logical AND' (&&) operation and pushes the result
+        """
 
-            frame, name = get_frame_and_name(arg1)
-            varsFrame = search_in_frame(frame, name)
+        arg1Value, arg2Value = self.stack_bool_operands(inst, 2)
+        self.varStack.append(arg1Value and arg2Value)
 
-            arg2Type, arg2Body = symb_arg(inst, "arg2")
-            arg2Type, arg2Value = get_type_value(arg2Body, arg2Type)
+    def ors(self, inst):
+        """
+        Pops two values, performs the 'logical OR' (||) operation and pushes the result
+        """
 
-            if (arg2Type != "bool"):
-                err_msg("The second argument is not a bool in {}".format(inst.attrib), WrongOperandTypeErr)
+        arg1Value, arg2Value = self.stack_bool_operands(inst, 2)
+        self.varStack.append(arg1Value or arg2Value)
 
-            if (arg2Value == "true"):
-                argStruct = {'type': 'bool', 'value': 'false'}
-                varsFrame[name] = argStruct
-            elif (arg2Value == "false"):
-                argStruct = {'type': 'bool', 'value': 'true'}
-                varsFrame[name] = argStruct
+    def nots(self, inst):
+        """
+        Pops the bool value and pushes its negation
+        """
 
-        def relation_operations_setup():
-            """
-            Makes a setup for relation operations
-            """
+        arg1Value, = self.stack_bool_operands(inst, 1)
+        self.varStack.append(not arg1Value)
 
-            name, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = get_var_symb_symb()
+    def int2chars(self, inst):
+        """
+        Pops the int, converts it to the string and pushes it
+        """
 
-            if (arg2Type == "int" and arg3Type == "int"):
-                try:
-                    arg2Value = int(arg2Value)
-                    arg3Value = int(arg3Value)
-                except TypeError:
-                    err_msg("Cannot convert value to int type in instruction {}".format(inst.attrib), InternalErr)
-            
-            return name, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value
+        arg1Value, = self.pop_operands(inst, 1)
+        if (type(arg1Value) is not int):
+            err_msg("Operand can be only 'int' type in instruction {}".format(inst), WrongOperandTypeErr)
 
-        def make_correct_form_of_result(result):
-            """
-            Convert the bool result value to the string result
-            """
+        try:
+            converted = chr(arg1Value)
+        except (ValueError, OverflowError):
+            err_msg("The value in instruction cannot be converted... Instruction: {}".format(inst), StringOperationErr)
+        self.varStack.append(converted)
 
-            if (result):
-                result = "true"
-            else:
-                result = "false"
+    def stri2ints(self, inst):
+        """
+        Pops the string and the index (pushed last), pushes the ordinal value of the char on the index
+        """
 
-            return result
+        arg1Value, arg2Value = self.pop_operands(inst, 2)
+        if (type(arg1Value) is not str):
+            err_msg("The first operand is not a string in {}".format(inst), WrongOperandTypeErr)
 
-        def lt():
-            """
-            Performs the 'less than' (<) operation between arg2 and arg3... stores the result to arg1 variable
-            """
-            
-            name, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = relation_operations_setup()
-            result = None
-
-            if (arg2Type == "int" and arg3Type == "int"):
-                result = arg2Value < arg3Value
-            elif (arg2Type == "string" and  arg3Type == "string"):
-                arg2Value = convert_unicode_values_in_string(arg2Value)
-                arg3Value = convert_unicode_values_in_string(arg3Value)
-                result = arg2Value < arg3Value
-            elif (arg2Type == "bool" and arg3Type == "bool"):
-                if arg2Value == "false" and arg3Value == "true":
-                    result = True
-                else:
-                    result = False
-            else:
-                err_msg("Operand types are not supported in LT instruction", WrongOperandTypeErr)
+        if (type(arg2Value) is not int):
+            err_msg("The second operand is not an int in {}".format(inst), WrongOperandTypeErr)
 
-            result = make_correct_form_of_result(result)
-            argStruct = {'type': 'bool', 'value': result}
-            varsFrame[name] = argStruct
+        if (arg2Value < 0 or arg2Value >= len(arg1Value)):
+            err_msg("Index out of the string in instruction {}".format(inst), StringOperationErr)
+        self.varStack.append(ord(arg1Value[arg2Value]))
 
-        def gt():
-            """
-            Performs the 'greater than' (>) operation between arg2 and arg3... stores the result to arg1 variable
-            """
-            
-            name, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = relation_operations_setup()
-            result = None
-
-            if (arg2Type == "int" and arg3Type == "int"):
-                result = arg2Value > arg3Value
-            elif (arg2Type == "string" and  arg3Type == "string"):
-                arg2Value = convert_unicode_values_in_string(arg2Value)
-                arg3Value = convert_unicode_values_in_string(arg3Value)
-                result = arg2Value > arg3Value
-            elif (arg2Type == "bool" and arg3Type == "bool"):
-                if arg2Value == "true" and arg3Value == "false":
-                    result = True
-                else:
-                    result = False
-            else:
-                err_msg("Operand types are not supported in GT instruction", WrongOperandTypeErr)
+    def jumpifeqs(self, inst):
+        """
+        Pops two values and performs jump in instruction counter if they are equal
+        """
 
-            result = make_correct_form_of_result(result)
-            argStruct = {'type': 'bool', 'value': result}
-            varsFrame[name] = argStruct
+        if (self.stack_operands_are_equal(inst)):
+            return self.label_arg(inst, 0)
 
-        def eq():
-            """
-            Performs the 'equal' (==) operation between arg2 and arg3... stores the result to arg1 variable
-            """
-            
-            name, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = relation_operations_setup()
-            result = None
-
-            if (arg2Type == "int" and arg3Type == "int"):
-                result = arg2Value == arg3Value
-            elif (arg2Type == "string" and  arg3Type == "string"):
-                arg2Value = convert_unicode_values_in_string(arg2Value)
-                arg3Value = convert_unicode_values_in_string(arg3Value)
-                result = arg2Value == arg3Value
-            elif (arg2Type == "bool" and arg3Type == "bool"):
-                if arg2Value == "true" and arg3Value == "true":
-                    result = True
-                elif arg2Value == "false" and arg3Value == "false":
-                    result = True
-                else:
-                    result = False
-            elif (arg2Type == "nil" or arg3Type == "nil"):
-                if (arg2Type == "nil" and arg3Type == "nil"):
-                    result = True
-                else:
-                    result = False
-            else:
-                err_msg("Operand types are not supported in EQ instruction", WrongOperandTypeErr)
+    def jumpifneqs(self, inst):
+        """
+        Pops two values and performs jump in instruction counter if they are not equal
+        """
 
-            result = make_correct_form_of_result(result)
-            argStruct = {'type': 'bool', 'value': result}
-            varsFrame[name] = argStruct
+        if (not self.stack_operands_are_equal(inst)):
+            return self.label_arg(inst, 0)
 
-        def _and():
-            """
-            Performs the 'logical AND' (&&) operation between arg2 and arg3... stores the result to arg1 variable
-            """
+    def int2char(self, inst):
+        """
+        Convert the int from arg2 value to the string and stores it to the arg1 variable
+        """
 
-            name, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = get_var_symb_symb()
-            result = None
+        arg1 = self.var_arg(inst, 0)
 
-            if (arg2Type != "bool" or arg3Type != "bool"):
-                err_msg("One of the operands are not bool in instruction {}".format(inst.attrib), WrongOperandTypeErr)
+        frame, slot = self.get_frame_and_name(arg1)
+        varsFrame = self.search_in_frame(frame, slot)
 
-            if (arg2Value == "true" and arg3Value == "true"):
-                result = True
-            else:
-                result = False
+        arg2Type, arg2Body = self.symb_arg(inst, 1)
+        arg2Type, arg2Value = self.get_type_value(inst, arg2Body, arg2Type)
 
-            result = make_correct_form_of_result(result)
-            argStruct = {'type': 'bool', 'value': result}
-            varsFrame[name] = argStruct
+        if (arg2Value is None):
+            err_msg("Uninitialized value of integer in instruction {}".format(inst), MissingValueErr)
 
-        def _or():
-            """
-            Performs the 'logical OR' (||) operation between arg2 and arg3... stores the result to arg1 variable
-            """
+        if (arg2Type != "int"):
+            err_msg("arg2 value can be only 'int' type", WrongOperandTypeErr)
+        
+        try:
+            converted = chr(arg2Value)
+        except (ValueError, OverflowError):
+            err_msg("The value in instruction cannot be converted... Instruction: {}".format(inst), StringOperationErr)
 
-            name, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = get_var_symb_symb()
-            result = None
+        varsFrame[slot] = converted
 
-            if (arg2Type != "bool" or arg3Type != "bool"):
-                err_msg("One of the operands are not bool in instruction {}".format(inst.attrib), WrongOperandTypeErr)
+    def stri2int(self, inst):
+        """
+        Convert the string from arg2 value at arg3 index to the int and stores it to the arg1 variable
+        """
 
-            if (arg2Value == "true" or arg3Value == "true"):
-                result = True
-            else:
-                result = False
+        slot, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = self.get_var_symb_symb(inst, keepBuffer=True)
 
-            result = make_correct_form_of_result(result)
-            argStruct = {'type': 'bool', 'value': result}
-            varsFrame[name] = argStruct
+        if (arg2Type != "string"):
+            err_msg("The second argument is not a string in {}".format(inst), WrongOperandTypeErr)
 
-        def concat():
-            """
-            Concatenate the arg2 and arg3 strings and stores the result to arg1 variable
-            """
+        if (arg3Type != "int"):
+            err_msg("The third argument is not an int in {}".format(inst), WrongOperandTypeErr)
 
-            name, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = get_var_symb_symb()
+        if (arg3Value < 0):
+            err_msg("Negative number in index in instruction {}".format(inst), StringOperationErr)
+        
+        try:
+            result = ord(arg2Value[arg3Value])
+        except:
+            err_msg("Function ord() exception caught in instruction {}".format(inst), StringOperationErr)
+        varsFrame[slot] = result
 
-            if (arg2Type == "string"):
-                arg2Value = convert_unicode_values_in_string(arg2Value)
-            else:
-                err_msg("The second argument is not a string in {}".format(inst.attrib), WrongOperandTypeErr)
+    def _return(self, inst):
+        """
+        Returns to the previous CALL instruction
+        """
 
-            if (arg3Type == "string"):
-                arg3Value = convert_unicode_values_in_string(arg3Value)
-            else:
-                err_msg("The third argument is not a string in {}".format(inst.attrib), WrongOperandTypeErr)
+        if (self.instPointerStack is None or len(self.instPointerStack) < 1):
+            err_msg("Return called without previos CALL instruction", MissingValueErr)
+        else:
+            return self.instPointerStack.pop()
 
-            argStruct = {'type': 'string', 'value': arg2Value + arg3Value}
-            varsFrame[name] = argStruct
+    def call(self, inst):
+        """
+        Jumping on the arg1 label, and storing the instruction pointer of the CALL for RETURN inst
+        """
 
-        def getchar():
-            """
-            Get char from arg2 string on arg3 index and stores it to arg1 variable
-            """
+        if (self.instPointerStack is None):
+            self.instPointerStack = []
 
-            name, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = get_var_symb_symb()
+        self.instPointerStack.append(self.instructPointer)
+        return self.label_arg(inst, 0)
 
-            if (arg2Type == "string"):
-                arg2Value = convert_unicode_values_in_string(arg2Value)
+    def _break(self, inst):
+        """
+        Prints the current instruction, all frames and how many instructions were executed already
+        """
+
+        print("Break instruction executed as {}. in order".format(inst.order),file=self.errors)
+        print("GF: {}".format(self.frame_to_dict(self.GF, self.globalNames)),file=self.errors)
+        print("LF: {}".format(self.frame_to_dict(self.LFTop, self.localNames)),file=self.errors)
+        print("TF: {}".format(self.frame_to_dict(self.TF, self.localNames)),file=self.errors)
+        print("Instructions already executed: {}".format(self.executed - 1),file=self.errors)
+
+    def dprint(self, inst):
+        """
+        Prints the value of arg1 to the stderr
+        """
+
+        arg1Type, arg1Body = self.symb_arg(inst, 0)
+        arg1Type, arg1Value = self.get_type_value(inst, arg1Body, arg1Type)
+
+        print(value_to_str(arg1Value), end='', file=self.errors)
+
+    def strlen(self, inst):
+        """
+        Stores the length of string in arg2 to the arg1 variable
+        """
+
+        arg1 = self.var_arg(inst, 0)
+
+        frame, slot = self.get_frame_and_name(arg1)
+        varsFrame = self.search_in_frame(frame, slot)
+
+        arg2Type, arg2Body = self.symb_arg(inst, 1)
+        arg2Type, arg2Value = self.get_type_value(inst, arg2Body, arg2Type, keepBuffer=True)
+
+        if (arg2Type != "string"):
+            err_msg("The second argument is not a string in {}".format(inst), WrongOperandTypeErr)
+
+        result = len(arg2Value)
+
+        varsFrame[slot] = result
+
+    def _not(self, inst):
+        """
+        Performs NOT operation on arg2 bool value and stores it to arg1 variable
+        """
+
+        arg1 = self.var_arg(inst, 0)
+
+        frame, slot = self.get_frame_and_name(arg1)
+        varsFrame = self.search_in_frame(frame, slot)
+
+        arg2Type, arg2Body = self.symb_arg(inst, 1)
+        arg2Type, arg2Value = self.get_type_value(inst, arg2Body, arg2Type)
+
+        if (arg2Type != "bool"):
+            err_msg("The second argument is not a bool in {}".format(inst), WrongOperandTypeErr)
+
+        varsFrame[slot] = not arg2Value
+
+    def lt(self, inst):
+        """
+        Performs the 'less than' (<) operation between arg2 and arg3... stores the result to arg1 variable
+        """
+        
+        slot, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = self.get_var_symb_symb(inst)
+
+        if (arg2Type != arg3Type or arg2Type not in ("int", "string", "bool")):
+            err_msg("Operand types are not supported in LT instruction", WrongOperandTypeErr)
+
+        varsFrame[slot] = arg2Value < arg3Value
+
+    def gt(self, inst):
+        """
+        Performs the 'greater than' (>) operation between arg2 and arg3... stores the result to arg1 variable
+        """
+        
+        slot, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = self.get_var_symb_symb(inst)
+
+        if (arg2Type != arg3Type or arg2Type not in ("int", "string", "bool")):
+            err_msg("Operand types are not supported in GT instruction", WrongOperandTypeErr)
+
+        varsFrame[slot] = arg2Value > arg3Value
+
+    def eq(self, inst):
+        """
+        Performs the 'equal' (==) operation between arg2 and arg3... stores the result to arg1 variable
+        """
+        
+        slot, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = self.get_var_symb_symb(inst)
+
+        if (arg2Type == "nil" or arg3Type == "nil"):
+            result = arg2Type == arg3Type
+        elif (arg2Type == arg3Type):
+            result = arg2Value == arg3Value
+        else:
+            err_msg("Operand types are not supported in EQ instruction", WrongOperandTypeErr)
+
+        varsFrame[slot] = result
+
+    def _and(self, inst):
+        """
+        Performs the 'logical AND' (&&) operation between arg2 and arg3... stores the result to arg1 variable
+        """
+
+        slot, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = self.get_var_symb_symb(inst)
+
+        if (arg2Type != "bool" or arg3Type != "bool"):
+            err_msg("One of the operands are not bool in instruction {}".format(inst), WrongOperandTypeErr)
+
+        varsFrame[slot] = arg2Value and arg3Value
+
+    def _or(self, inst):
+        """
+        Performs the 'logical OR' (||) operation between arg2 and arg3... stores the result to arg1 variable
+        """
+
+        slot, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = self.get_var_symb_symb(inst)
+
+        if (arg2Type != "bool" or arg3Type != "bool"):
+            err_msg("One of the operands are not bool in instruction {}".format(inst), WrongOperandTypeErr)
+
+        varsFrame[slot] = arg2Value or arg3Value
+
+    def concat(self, inst):
+        """
+        Concatenate the arg2 and arg3 strings and stores the result to arg1 variable
+        """
+
+        if (same_variable(inst.args[0], inst.args[1])):
+            # Appending to the variable itself, its buffer is extended in place (without flattening it)
+            frame, slot = self.get_frame_and_name(inst.args[0])
+            varsFrame = self.search_in_frame(frame, slot)
+            buffer = varsFrame[slot]
+            if (type(buffer) is StringBuffer):
+                arg3Type, arg3Body = self.symb_arg(inst, 2)
+                arg3Type, arg3Value = self.get_type_value(inst, arg3Body, arg3Type)
+
+                if (arg3Type is None):
+                    err_msg("Uninitialized variabel in arg2 or arg3 in instruction {}".format(inst), MissingValueErr)
+
+                if (arg3Type != "string"):
+                    err_msg("The third argument is not a string in {}".format(inst), WrongOperandTypeErr)
+
+                buffer.append(arg3Value)
+                return
+
+        slot, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = self.get_var_symb_symb(inst)
+
+        if (arg2Type != "string"):
+            err_msg("The second argument is not a string in {}".format(inst), WrongOperandTypeErr)
+
+        if (arg3Type != "string"):
+            err_msg("The third argument is not a string in {}".format(inst), WrongOperandTypeErr)
+
+        if (same_variable(inst.args[0], inst.args[1])):
+            buffer = StringBuffer(arg2Value)
+            buffer.append(arg3Value)
+            varsFrame[slot] = buffer
+        else:
+            varsFrame[slot] = arg2Value + arg3Value
+
+    def getchar(self, inst):
+        """
+        Get char from arg2 string on arg3 index and stores it to arg1 variable
+        """
+
+        slot, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = self.get_var_symb_symb(inst, keepBuffer=True)
+
+        if (arg2Type != "string"):
+            err_msg("The second argument is not a string in {}".format(inst), WrongOperandTypeErr)
+
+        if (arg3Type != "int"):
+            err_msg("The third argument is not an int in {}".format(inst), WrongOperandTypeErr)
+        if (arg3Value < 0):
+            err_msg("Negative number in index in instruction {}".format(inst), StringOperationErr)
+        try:
+            result = arg2Value[arg3Value]
+        except IndexError:
+            err_msg("GETCHAR is out of the string index in instruction {}".format(inst), StringOperationErr)
+        varsFrame[slot] = result
+
+    def setchar(self, inst):
+        """
+        Set char to agr1 string from arg3 on arg2 index
+        """
+
+        slot, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = self.get_var_symb_symb(inst)
+
+        arg1Value = varsFrame[slot]
+        # Only the StringBuffer is not in valueTypes
+        arg1Type = valueTypes.get(type(arg1Value), "string")
+
+        if (arg1Value is None):
+            err_msg("Uninitialized variadble in arg: arg1. In instruction: {}".format(inst), MissingValueErr)
+
+        if (arg1Type != "string"):
+            err_msg("The first argument is not a string in {}".format(inst), WrongOperandTypeErr)
+
+        if (arg2Type != "int"):
+            err_msg("The second argument is not an int in {}".format(inst), WrongOperandTypeErr)
+        if (arg2Value < 0):
+            err_msg("Negative number in index in instruction {}".format(inst), StringOperationErr)
+
+        if (arg3Type != "string"):
+            err_msg("The third argument is not a string in {}".format(inst), WrongOperandTypeErr)
+
+        if(len(arg3Value) < 1):
+            err_msg("You want to set something into empty string in {}".format(inst), StringOperationErr)
+
+        if (arg2Value >= len(arg1Value)):
+            err_msg("IndexError during SETCHAR instruction in {}".format(inst), StringOperationErr)
+
+        if (type(arg1Value) is not StringBuffer):
+            arg1Value = StringBuffer(arg1Value)
+            varsFrame[slot] = arg1Value
+        arg1Value.set_char(arg2Value, arg3Value[0])
+
+    def count_fused(self, nextInst):
+        """
+        Counts the second instruction of the fused pair, the same way as the interpret loop does
+        """
+
+        self.executed += 1
+        if (self.executed > self.maxInsts):
+            err_msg("Limit of {} executed instructions exceeded in instruction {}".format(self.maxInsts, nextInst), InstructionLimitErr)
+
+    def fused_pair(self, inst):
+        """
+        Executes the instruction and the next one in one dispatch (made by optimize_program)
+        """
+
+        opcodeHandlers[inst.opcode](self, inst)
+        nextInst = self.program[self.instructPointer + 1]
+        self.count_fused(nextInst)
+        opcodeHandlers[nextInst.opcode](self, nextInst)
+
+        # Skip the next instruction, it's already executed
+        return self.instructPointer + 1
+
+    def fused_compare_jump(self, inst):
+        """
+        Executes the bool operation into the temporary variable and the JUMPIFEQ/JUMPIFNEQ,
+        which compares that variable with the bool constant (made by optimize_program)
+        """
+
+        opcodeHandlers[inst.opcode](self, inst)
+        jumpInst = self.program[self.instructPointer + 1]
+        self.count_fused(jumpInst)
+
+        # The result is always bool, so the jump cannot fail on the operand types
+        frame, slot = self.get_frame_and_name(inst.args[0])
+        result = self.search_in_frame(frame, slot)[slot]
+        if (jumpInst.args[1].type == "var"):
+            expected = jumpInst.args[2].value
+        else:
+            expected = jumpInst.args[1].value
+
+        if ((result == expected) == (jumpInst.opcode == "JUMPIFEQ")):
+            return self.label_arg(jumpInst, 0)
+        return self.instructPointer + 1
+
+    # Handlers specialized by specialize_types, the operands are proven to be initialized GF variables
+    # (the operand value is the slot) or constants, so they are used without any checks
+
+    def typed_add(self, inst):
+        """
+        ADD of two int operands
+        """
+
+        target, arg2, arg3 = inst.args
+        GF = self.GF
+        GF[target.value] = (GF[arg2.value] if arg2.type == "var" else arg2.value) + \
+                           (GF[arg3.value] if arg3.type == "var" else arg3.value)
+
+    def typed_sub(self, inst):
+        """
+        SUB of two int operands
+        """
+
+        target, arg2, arg3 = inst.args
+        GF = self.GF
+        GF[target.value] = (GF[arg2.value] if arg2.type == "var" else arg2.value) - \
+                           (GF[arg3.value] if arg3.type == "var" else arg3.value)
+
+    def typed_mul(self, inst):
+        """
+        MUL of two int operands
+        """
+
+        target, arg2, arg3 = inst.args
+        GF = self.GF
+        GF[target.value] = (GF[arg2.value] if arg2.type == "var" else arg2.value) * \
+                           (GF[arg3.value] if arg3.type == "var" else arg3.value)
+
+    def typed_idiv(self, inst):
+        """
+        IDIV of two int operands, only the zero division is checked
+        """
+
+        target, arg2, arg3 = inst.args
+        GF = self.GF
+        divisor = GF[arg3.value] if arg3.type == "var" else arg3.value
+        if (divisor == 0):
+            err_msg("Zero division in {}".format(inst), WrongOperandValue)
+        GF[target.value] = (GF[arg2.value] if arg2.type == "var" else arg2.value) // divisor
+
+    def typed_lt(self, inst):
+        """
+        LT of two operands of the same int or bool type
+        """
+
+        target, arg2, arg3 = inst.args
+        GF = self.GF
+        GF[target.value] = (GF[arg2.value] if arg2.type == "var" else arg2.value) < \
+                           (GF[arg3.value] if arg3.type == "var" else arg3.value)
+
+    def typed_gt(self, inst):
+        """
+        GT of two operands of the same int or bool type
+        """
+
+        target, arg2, arg3 = inst.args
+        GF = self.GF
+        GF[target.value] = (GF[arg2.value] if arg2.type == "var" else arg2.value) > \
+                           (GF[arg3.value] if arg3.type == "var" else arg3.value)
+
+    def typed_eq(self, inst):
+        """
+        EQ of two operands of the same int or bool type
+        """
+
+        target, arg2, arg3 = inst.args
+        GF = self.GF
+        GF[target.value] = (GF[arg2.value] if arg2.type == "var" else arg2.value) == \
+                           (GF[arg3.value] if arg3.type == "var" else arg3.value)
+
+    def typed_and(self, inst):
+        """
+        AND of two bool operands
+        """
+
+        target, arg2, arg3 = inst.args
+        GF = self.GF
+        GF[target.value] = (GF[arg2.value] if arg2.type == "var" else arg2.value) and \
+                           (GF[arg3.value] if arg3.type == "var" else arg3.value)
+
+    def typed_or(self, inst):
+        """
+        OR of two bool operands
+        """
+
+        target, arg2, arg3 = inst.args
+        GF = self.GF
+        GF[target.value] = (GF[arg2.value] if arg2.type == "var" else arg2.value) or \
+                           (GF[arg3.value] if arg3.type == "var" else arg3.value)
+
+    def typed_not(self, inst):
+        """
+        NOT of the bool operand
+        """
+
+        target, arg2 = inst.args
+        GF = self.GF
+        GF[target.value] = not (GF[arg2.value] if arg2.type == "var" else arg2.value)
+
+    def typed_move(self, inst):
+        """
+        MOVE of the int or bool operand (the string can be the buffer of its variable, so it's not copied here)
+        """
+
+        target, arg2 = inst.args
+        GF = self.GF
+        GF[target.value] = GF[arg2.value] if arg2.type == "var" else arg2.value
+
+    def typed_jumpifeq(self, inst):
+        """
+        JUMPIFEQ of two operands of the same int or bool type
+        """
+
+        label, arg2, arg3 = inst.args
+        GF = self.GF
+        if ((GF[arg2.value] if arg2.type == "var" else arg2.value) == (GF[arg3.value] if arg3.type == "var" else arg3.value)):
+            return label.value
+
+    def typed_jumpifneq(self, inst):
+        """
+        JUMPIFNEQ of two operands of the same int or bool type
+        """
+
+        label, arg2, arg3 = inst.args
+        GF = self.GF
+        if ((GF[arg2.value] if arg2.type == "var" else arg2.value) != (GF[arg3.value] if arg3.type == "var" else arg3.value)):
+            return label.value
+
+# Dispatch table, built once per process
+opcodeHandlers = {
+    "CREATEFRAME": Interpret.create_frame,
+    "PUSHFRAME": Interpret.push_frame,
+    "POPFRAME": Interpret.pop_frame,
+    "RETURN": Interpret._return,
+    "BREAK": Interpret._break,
+    # 1 argument
+    "DEFVAR": Interpret.defvar,
+    "CALL": Interpret.call,
+    "PUSHS": Interpret.pushs,
+    "POPS": Interpret.pops,
+    "WRITE": Interpret.write,
+    "LABEL": Interpret.label,
+    "JUMP": Interpret.jump,
+    "EXIT": Interpret._exit,
+    "DPRINT": Interpret.dprint,
+    # 2 arguments
+    "MOVE": Interpret.move,
+    "INT2CHAR": Interpret.int2char,
+    "READ": Interpret._read,
+    "STRLEN": Interpret.strlen,
+    "TYPE": Interpret._type,
+    "NOT": Interpret._not,
+    # 3 arguments
+    "ADD": Interpret.add,
+    "SUB": Interpret.sub,
+    "MUL": Interpret.mul,
+    "IDIV": Interpret.idiv,
+    "LT": Interpret.lt,
+    "GT": Interpret.gt,
+    "EQ": Interpret.eq,
+    "AND": Interpret._and,
+    "OR": Interpret._or,
+    "STRI2INT": Interpret.stri2int,
+    "CONCAT": Interpret.concat,
+    "GETCHAR": Interpret.getchar,
+    "SETCHAR": Interpret.setchar,
+    "JUMPIFEQ": Interpret.jumpifeq,
+    "JUMPIFNEQ": Interpret.jumpifneq,
+    # STACK extension
+    "CLEARS": Interpret.clears,
+    "ADDS": Interpret.adds,
+    "SUBS": Interpret.subs,
+    "MULS": Interpret.muls,
+    "IDIVS": Interpret.idivs,
+    "LTS": Interpret.lts,
+    "GTS": Interpret.gts,
+    "EQS": Interpret.eqs,
+    "ANDS": Interpret.ands,
+    "ORS": Interpret.ors,
+    "NOTS": Interpret.nots,
+    "INT2CHARS": Interpret.int2chars,
+    "STRI2INTS": Interpret.stri2ints,
+    "JUMPIFEQS": Interpret.jumpifeqs,
+    "JUMPIFNEQS": Interpret.jumpifneqs,
+}
+
+# Instructions, which always store bool to the arg1 variable
+boolResultInst = ["LT", "GT", "EQ", "AND", "OR", "NOT"]
+
+# Handlers specialized by the proven operand types (made by specialize_types)
+intInt = ("int", "int")
+boolBool = ("bool", "bool")
+typedHandlers = {
+    ("ADD", intInt): Interpret.typed_add, ("SUB", intInt): Interpret.typed_sub,
+    ("MUL", intInt): Interpret.typed_mul, ("IDIV", intInt): Interpret.typed_idiv,
+    ("LT", intInt): Interpret.typed_lt, ("LT", boolBool): Interpret.typed_lt,
+    ("GT", intInt): Interpret.typed_gt, ("GT", boolBool): Interpret.typed_gt,
+    ("EQ", intInt): Interpret.typed_eq, ("EQ", boolBool): Interpret.typed_eq,
+    ("AND", boolBool): Interpret.typed_and, ("OR", boolBool): Interpret.typed_or, ("NOT", ("bool",)): Interpret.typed_not,
+    ("MOVE", ("int",)): Interpret.typed_move, ("MOVE", ("bool",)): Interpret.typed_move,
+    ("JUMPIFEQ", intInt): Interpret.typed_jumpifeq, ("JUMPIFEQ", boolBool): Interpret.typed_jumpifeq,
+    ("JUMPIFNEQ", intInt): Interpret.typed_jumpifneq, ("JUMPIFNEQ", boolBool): Interpret.typed_jumpifneq}
+
+# Taken backward jumps to the label, after which the loop is specialized (see Interpret.taken_jump)
+hotLoopThreshold = 100
+
+def guarded_handler(inst, typedHandler, types):
+    """
+    Returns the handler of the hot loop instruction, which runs typedHandler while the written variable
+    is defined and the variable operands have the observed types. When the guard fails,
+    the instruction goes back to its reference handler (which does all the checks).
+
+    Parameters:
+    inst (Instruction): Instruction with the reference handler
+    typedHandler (function): Handler without checks (see typedHandlers)
+    types (list): Observed types of the <symb> operands
+    """
+
+    pythonTypes = {"int": int, "bool": bool}
+    checks = tuple((arg.value, pythonTypes[argType]) for arg, argType in zip(inst.args[1:], types) if arg.type == "var")
+    targetSlot = None
+    if (inst.args[0].type == "var"):
+        targetSlot = inst.args[0].value
+
+    def guarded(interpret, inst):
+        GF = interpret.GF
+        if (targetSlot is None or GF[targetSlot] is not undefined):
+            for slot, pythonType in checks:
+                if (type(GF[slot]) is not pythonType):
+                    break
+            else:
+                return typedHandler(interpret, inst)
+
+        inst.handler = opcodeHandlers[inst.opcode]
+        return inst.handler(interpret, inst)
+    return guarded
+
+# Type of the variable written by the instruction, MOVE takes the type of its operand
+resultTypes = {
+    "ADD": "int", "SUB": "int", "MUL": "int", "IDIV": "int", "STRLEN": "int", "STRI2INT": "int",
+    "LT": "bool", "GT": "bool", "EQ": "bool", "AND": "bool", "OR": "bool", "NOT": "bool",
+    "CONCAT": "string", "INT2CHAR": "string", "GETCHAR": "string", "TYPE": "string", "SETCHAR": "string"}
+
+# Type, which all <symb> operands must have, when the instruction doesn't end with an error
+operandTypes = {"ADD": "int", "SUB": "int", "MUL": "int", "IDIV": "int", "AND": "bool", "OR": "bool", "NOT": "bool",
+                "CONCAT": "string", "STRLEN": "string"}
+
+# Instructions folded by optimize_program, when all their <symb> operands are constants
+foldableInst = ["ADD", "SUB", "MUL", "IDIV", "LT", "GT", "EQ", "AND", "OR", "NOT", "INT2CHAR", "STRI2INT",
+                "CONCAT", "STRLEN", "GETCHAR", "TYPE", "JUMPIFEQ", "JUMPIFNEQ"]
+
+# Handlers of the instruction pairs fused by optimize_program
+fusedHandlers = {
+    "compare+jump": Interpret.fused_compare_jump,
+    "defvar+move": Interpret.fused_pair,
+    "pushs+pops": Interpret.fused_pair}
+
+class InputReader(object):
+    """
+    Reads the input of the READ instruction line by line, only when it is needed
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def read_line(self):
+        """
+        Returns the next line without the new line character, or None at the end of the input
+        """
+
+        line = self.stream.readline()
+        if (line == ""):
+            return None
+        if (line[-1] == "\n"):
+            line = line[:-1]
+        return line
+
+class OutputWriter(object):
+    """
+    Buffered sink for the output of the WRITE instruction.
+
+    Modes:
+    spool  - output is spooled (in memory, then in a temporary file) and written only
+             when the program ends successfully, so it is thrown away on error
+    stream - output is written in large chunks while the program runs
+    line   - output is written after every new line (for pipelines)
+    """
+
+    outputModes = ["spool", "stream", "line"]
+
+    def __init__(self, stream, mode="spool", chunkSize=65536):
+        self.stream = stream
+        self.mode = mode
+        self.chunkSize = chunkSize
+        self.pending = []
+        self.pendingSize = 0
+        self.closed = False
+
+        if (mode == "spool"):
+            self.target = tempfile.SpooledTemporaryFile(max_size=16 * chunkSize, mode="w+", encoding="utf-8")
+        else:
+            self.target = stream
+
+    def write(self, text):
+        """
+        Buffers the text, the buffer is written out when it is big enough
+        """
+
+        self.pending.append(text)
+        self.pendingSize += len(text)
+
+        if (self.pendingSize >= self.chunkSize):
+            self.drain()
+            if (self.mode == "line"):
+                self.stream.flush()
+        elif (self.mode == "line" and "\n" in text):
+            self.drain()
+            self.stream.flush()
+
+    def drain(self):
+        """
+        Moves the buffered text to the target (stream or spool file)
+        """
+
+        if (self.pending):
+            self.target.write("".join(self.pending))
+            self.pending = []
+            self.pendingSize = 0
+
+    def close(self):
+        """
+        The program ended successfully, writes everything to the stream
+        """
+
+        if (self.closed):
+            return
+        self.closed = True
+
+        self.drain()
+        if (self.mode == "spool"):
+            self.target.seek(0)
+            shutil.copyfileobj(self.target, self.stream, self.chunkSize)
+            self.target.close()
+        self.stream.flush()
+
+    def abort(self):
+        """
+        The program ended with error, spooled output is thrown away
+        """
+
+        if (self.closed):
+            return
+        self.closed = True
+
+        if (self.mode == "spool"):
+            self.target.close()
+        else:
+            self.drain()
+            self.stream.flush()
+
+class Profiler(object):
+    """
+    Measures every executed instruction, the handlers of the program copy are wrapped,
+    so the interpret loop is the same (and without overhead) when profiling is off.
+    Fused instruction pairs (--optimize) are measured as their first instruction.
+    """
+
+    def __init__(self, reportFile):
+        self.reportFile = reportFile
+        self.instructions = []
+        try:
+            self.textStream = open(reportFile, 'w', encoding='utf-8')
+            self.jsonStream = open(reportFile + ".json", 'w', encoding='utf-8')
+        except OSError:
+            err_msg("Profile file '{}' cannot be opened".format(reportFile), OutputFileErr)
+
+    def instrument(self, program):
+        """
+        Returns the copy of the program, whose instructions are measured
+        """
+
+        profiled = []
+        for inst in program:
+            stats = [0, 0.0]
+            self.instructions.append((inst, stats))
+            record = Instruction(inst.opcode, inst.order, inst.args)
+            record.handler = self.measured(inst.handler, stats)
+            profiled.append(record)
+        return profiled
+
+    def measured(self, handler, stats):
+        """
+        Wraps the handler, the count and time are stored even if the handler exits
+        """
+
+        def profiled(interpret, inst):
+            start = time.perf_counter()
+            try:
+                return handler(interpret, inst)
+            finally:
+                stats[0] += 1
+                stats[1] += time.perf_counter() - start
+        return profiled
+
+    def report(self):
+        """
+        Returns the per opcode and per instruction statistics, sorted by the total time
+        """
+
+        opcodes = {}
+        instructions = []
+        for inst, (count, total) in self.instructions:
+            if (count == 0):
+                continue
+            opcodeStats = opcodes.setdefault(inst.opcode, [0, 0.0])
+            opcodeStats[0] += count
+            opcodeStats[1] += total
+            instructions.append({"order": inst.order, "opcode": inst.opcode, "count": count,
+                                 "total": total, "average": total / count})
+
+        opcodes = [{"opcode": opcode, "count": count, "total": total, "average": total / count}
+                   for opcode, (count, total) in opcodes.items()]
+        opcodes.sort(key=lambda stats: stats["total"], reverse=True)
+        instructions.sort(key=lambda stats: stats["total"], reverse=True)
+        return {"opcodes": opcodes, "instructions": instructions}
+
+    def write(self):
+        """
+        Writes the report to the text file and to the JSON file (<file>.json)
+        """
+
+        report = self.report()
+
+        with self.textStream as stream:
+            print("{:<12} {:>12} {:>12} {:>14}".format("opcode", "count", "total [s]", "average [us]"), file=stream)
+            for stats in report["opcodes"]:
+                print("{:<12} {:>12} {:>12.6f} {:>14.3f}".format(stats["opcode"], stats["count"], stats["total"],
+                      stats["average"] * 1e6), file=stream)
+            print("", file=stream)
+            print("{:<8} {:<12} {:>12} {:>12} {:>14}".format("order", "opcode", "count", "total [s]", "average [us]"),
+                  file=stream)
+            for stats in report["instructions"]:
+                print("{:<8} {:<12} {:>12} {:>12.6f} {:>14.3f}".format(stats["order"], stats["opcode"], stats["count"],
+                      stats["total"], stats["average"] * 1e6), file=stream)
+
+        with self.jsonStream as stream:
+            json.dump(report, stream, indent=2)
+
+class Statistics(object):
+    """
+    Collects the peak values of the run for --stats, the handlers of the program copy are wrapped
+    like in the Profiler. Fused instruction pairs are split again, so every instruction is tracked.
+    """
+
+    def __init__(self, statsFile):
+        self.executed = 0
+        self.variables = 0
+        self.peakVariables = 0
+        self.peakCallStack = 0
+        self.peakDataStack = 0
+        try:
+            self.stream = open(statsFile, 'w', encoding='utf-8')
+        except OSError:
+            err_msg("Statistics file '{}' cannot be opened".format(statsFile), OutputFileErr)
+
+    def instrument(self, program):
+        """
+        Returns the copy of the program, whose instructions are tracked
+        """
+
+        tracked = []
+        for inst in program:
+            record = Instruction(inst.opcode, inst.order, inst.args)
+            record.handler = self.counted(self.tracked(record.handler, inst.opcode))
+            tracked.append(record)
+        return tracked
+
+    def counted(self, handler):
+        """
+        Wraps the handler, so the executed instructions are counted
+        """
+
+        def counted_handler(interpret, inst):
+            self.executed += 1
+            return handler(interpret, inst)
+        return counted_handler
+
+    def tracked(self, handler, opcode):
+        """
+        Wraps the handler of the instruction, which can change the tracked values
+        """
+
+        if (opcode in ("CREATEFRAME", "POPFRAME")):
+            def frame_handler(interpret, inst):
+                # The temporary frame is thrown away (or replaced)
+                varsFrame = interpret.TF
+                newPointer = handler(interpret, inst)
+                self.variables -= self.initialized(varsFrame)
+                return newPointer
+            return frame_handler
+        elif (opcode == "CALL"):
+            def call_handler(interpret, inst):
+                newPointer = handler(interpret, inst)
+                self.peakCallStack = max(self.peakCallStack, len(interpret.instPointerStack))
+                return newPointer
+            return call_handler
+        elif (opcode == "PUSHS"):
+            def push_handler(interpret, inst):
+                newPointer = handler(interpret, inst)
+                self.peakDataStack = max(self.peakDataStack, len(interpret.varStack))
+                return newPointer
+            return push_handler
+        elif (opcode != "DEFVAR" and instructionOperands[opcode][:1] == ("var",)):
+            def write_handler(interpret, inst):
+                # The handler ends with error, if the variable doesn't exist
+                arg = inst.args[0]
+                varsFrame = {"GF": interpret.GF, "LF": interpret.LFTop, "TF": interpret.TF}[arg.frame]
+                wasUninitialized = varsFrame is not None and arg.value < len(varsFrame) and varsFrame[arg.value] is None
+                newPointer = handler(interpret, inst)
+                if (wasUninitialized):
+                    self.variables += 1
+                    self.peakVariables = max(self.peakVariables, self.variables)
+                return newPointer
+            return write_handler
+        return handler
+
+    def initialized(self, varsFrame):
+        """
+        Returns the number of initialized variables in the frame
+        """
+
+        if (varsFrame is None):
+            return 0
+        return sum(1 for value in varsFrame if value is not None and value is not undefined)
+
+    def write(self):
+        """
+        Writes the statistics as JSON
+        """
+
+        with self.stream as stream:
+            json.dump({"executed": self.executed, "peak-variables": self.peakVariables,
+                       "peak-call-stack": self.peakCallStack, "peak-data-stack": self.peakDataStack}, stream, indent=2)
+            stream.write("\n")
+
+class UniqueDict(dict):
+    def __setitem__(self, key, value):
+        if (key not in self):
+            dict.__setitem__(self, key, value)
+        else:
+            raise KeyError("Key already exists")
+
+class XMLParse(object):
+    def __init__(self, source):
+        """
+        Creating the list of instructions in IPPCode20.
+        The XML source is parsed incrementally, every instruction is checked
+        and compiled as soon as it is read and its element is thrown away.
+
+        Parameters:
+        source (string | file): Path to the xml source file or opened file
+        """
+
+        self.listOfinstructions = [
+            "CREATEFRAME", "PUSHFRAME", "POPFRAME", "RETURN", "BREAK",
+            
+            "DEFVAR", "CALL", "PUSHS", "POPS", "WRITE", "LABEL", "JUMP", "EXIT", "DPRINT",
+
+            "MOVE", "INT2CHAR", "READ", "STRLEN", "TYPE", "NOT",
+
+            "ADD", "SUB", "MUL", "IDIV", "LT", "GT", "EQ", "AND", "OR", "STRI2INT", "CONCAT",                     
+            "GETCHAR", "SETCHAR", "JUMPIFEQ", "JUMPIFNEQ"] + stackInstructions + ["JUMPIFEQS", "JUMPIFNEQS"]
+
+        self.program = self.load_program(source)
+    
+    def program_tag_check(self, root):
+        """
+        Checks for the XML tag 'program' which is mandatory.
+        Next it check for valid attribute 'language'.
+        """
+
+        if (root.tag == "program"):
+            try:
+                root.attrib["language"]
+            except KeyError:
+                err_msg("The 'language' atribute is missing in a source file", UnexpectedXMLStructureErr)
+
+            if (root.attrib["language"] != "IPPcode20"):
+                err_msg("'language' attribute has wrong value (IPPCode20 is expected)", UnexpectedXMLStructureErr)
+        else:       # Missing or wrong program tag
+            err_msg("Source file have missing or wrong 'program' tag", UnexpectedXMLStructureErr)
+
+    def load_program(self, source):
+        """
+        Reads the source file element by element and builds the compiled program sorted by the order
+        """
+
+        self.compiled = []
+        self.constantPool = {}
+        self.structureErr = None
+        root = None
+
+        try:
+            # An instruction is complete, when the next one starts (or the file ends)
+            for event, element in xmlElementTree.iterparse(source, events=("start",)):
+                if (root is None):
+                    root = element
+                    try:
+                        self.program_tag_check(root)
+                    except InterpretError as error:
+                        # Reported only if the rest of the file is well-formed
+                        self.structureErr = error
+                elif (len(root) > 1):
+                    self.load_instruction(root[0])
+                    del root[0]
+        except xmlElementTree.ParseError:
+            err_msg("The source XML file is not well-formed.", WrongXMLFromatErr)
+        except OSError:
+            err_msg("Source file '{}' cannot be read".format(source), InputFileErr)
+
+        for element in root:
+            self.load_instruction(element)
+
+        if (self.structureErr is not None):
+            raise self.structureErr
+
+        compiled = self.compiled
+        compiled.sort(key=lambda inst: inst.order)
+        for index in range(1, len(compiled)):
+            if (compiled[index - 1].order == compiled[index].order):
+                err_msg("Order numbers are not unique", UnexpectedXMLStructureErr)
+
+        link_program(compiled)
+        return compiled
+
+    def load_instruction(self, element):
+        """
+        Checks and compiles the instruction, that was read whole
+        """
+
+        if (self.structureErr is not None):
+            return
+
+        try:
+            self.check_instruction(element)
+            self.compiled.append(compile_instruction(element, self.constantPool))
+        except InterpretError as error:
+            # Reported only if the rest of the file is well-formed
+            self.structureErr = error
+
+    def check_instruction(self, inst):
+        """
+        Checks if everything is valid in every instruction inside of the source file
+        Exit with error if the instruction is not defined by IPPCode20
+        """
+        
+        if (inst.tag != "instruction"):
+            err_msg("Wrong instruction tag in instruction {}".format(inst.attrib), UnexpectedXMLStructureErr)
+
+        # Is there 'order' attribute?
+        try:
+            inst.attrib["order"]
+        except KeyError:
+            err_msg("Missing 'order' attribute in instruction {}".format(inst.attrib), UnexpectedXMLStructureErr)
+
+        # Is there 'opcode' attribute?
+        try:
+            inst.attrib["opcode"]
+        except KeyError:
+            err_msg("Missing 'opcode' attribute in instruction {}".format(inst.attrib), UnexpectedXMLStructureErr)
+
+        # Check arguments
+        if (inst.attrib["opcode"].upper() in instructionsWithoutArgs and len(inst) != 0):
+            err_msg("Instruction {} shouldn't have any arguments".format(inst.attrib["opcode"]), UnexpectedXMLStructureErr)
+        else:
+            # Check for number of arguments
+            if (inst.attrib["opcode"].upper() in instructionsWithOneArg and len(inst) != 1):
+                err_msg("Instruction {} should have exactly one argument".format(inst.attrib["opcode"]), UnexpectedXMLStructureErr)
+            if (inst.attrib["opcode"].upper() in instructionsWithTwoArg and len(inst) != 2):
+                err_msg("Instruction {} should have exactly two arguments".format(inst.attrib["opcode"]), UnexpectedXMLStructureErr)
+            if (inst.attrib["opcode"].upper() in instructionsWithThreeArg and len(inst) != 3):
+                err_msg("Instruction {} should have exactly three argument".format(inst.attrib["opcode"]), UnexpectedXMLStructureErr)
+
+            for arg in inst:
+                try:
+                    arg.attrib["type"]
+                except KeyError:
+                    err_msg("Argument {} without 'type'".format(arg.attrib), UnexpectedXMLStructureErr)
+                 
+                if (arg.attrib["type"] not in argumentTypes):
+                    err_msg("Argument type is not supported in {}".format(arg.attrib), UnexpectedXMLStructureErr)
+
+                # Check text format of arguments
+                if (arg.attrib["type"] == "int"):
+                    if (not re.match(r'^(\+|-|)[0-9]+$', arg.text)):
+                        err_msg("Integer with value '{}' is not supported".format(arg.text), UnexpectedXMLStructureErr)
+                elif (arg.attrib["type"] == "bool"):
+                    if (not re.match('^(true|false)$', arg.text)):
+                        err_msg("Bool with value '{}' is not supported".format(arg.text), UnexpectedXMLStructureErr)
+                elif (arg.attrib["type"] == "string"):
+                    if (arg.text != None):
+                        if (not re.match(r'^([^\\\#\s]|(\\\d{3}))*$', arg.text)):
+                            err_msg("String with value '{}' is not supported".format(arg.text), UnexpectedXMLStructureErr)
+                elif (arg.attrib["type"] == "label"):
+                    if (not re.match(r'^[a-zA-Z_\-\$&%*!?][0-9a-zA-Z_\-\$&%*!?]*$', arg.text)):
+                        err_msg("Label with value '{}' is not supported".format(arg.text), UnexpectedXMLStructureErr)
+                elif (arg.attrib["type"] == "nil"):
+                    if (not re.match('^nil$', arg.text)):
+                        err_msg("Nil with value '{}' is not supported".format(arg.text), UnexpectedXMLStructureErr)
+
+        try:
+            order = int(inst.attrib["order"])
+        except ValueError:
+            err_msg("The 'order' number is not a number in instruction {}".format(inst.attrib), UnexpectedXMLStructureErr)
+
+        numOfInst = int(inst.attrib["order"])
+
+        # Order attribute checks
+        if (numOfInst < 1):
+            err_msg("Order attribute in instruction {} is lower than 1".format(inst.attrib), UnexpectedXMLStructureErr)
+
+        if (inst.attrib["opcode"].upper() not in self.listOfinstructions):
+            err_msg("Operation code in {} is not valid in IPPCode20".format(inst.attrib), UnexpectedXMLStructureErr)
+
+    def get_program(self):
+        """
+        Returns the compiled program
+
+        """
+
+        return self.program
+
+
+class NilType(object):
+    """
+    Type of the nil@nil value, there is only one instance of it
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "nil"
+
+nil = NilType()
+
+class UndefinedType(object):
+    """
+    Marks the frame slot of the variable, which is not defined (by DEFVAR) in that frame
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "undefined"
+
+undefined = UndefinedType()
+
+class StringBuffer(object):
+    """
+    Mutable string value, CONCAT appends to it and SETCHAR replaces its chars in place.
+    The buffer belongs only to one variable, every other read gets the flat str (see Interpret.get_var),
+    only STRLEN, GETCHAR and STRI2INT read the chars of the buffer directly.
+    """
+
+    __slots__ = ("chars", "flat")
+
+    def __init__(self, value):
+        self.chars = list(value)
+        self.flat = value
+
+    def __len__(self):
+        return len(self.chars)
+
+    def __getitem__(self, index):
+        return self.chars[index]
+
+    def append(self, value):
+        self.chars.extend(value)
+        self.flat = None
+
+    def set_char(self, index, char):
+        self.chars[index] = char
+        self.flat = None
+
+    def __str__(self):
+        # The flat string is joined only once after every change
+        if (self.flat is None):
+            self.flat = "".join(self.chars)
+        return self.flat
+
+    def __repr__(self):
+        return repr(str(self))
+
+# Values are stored as native objects (int, bool, str or nil), the Python type is their tag.
+# Defined but uninitialized variable holds None.
+valueTypes = {int: "int", bool: "bool", str: "string", NilType: "nil"}
+
+class Operand(object):
+    """
+    Pre-decoded argument of the instruction
+    """
+
+    __slots__ = ("type", "text", "frame", "name", "value")
+
+    def __init__(self, argType, text, frame=None, name=None, value=None):
+        self.type = argType
+        self.text = text
+        self.frame = frame
+        self.name = name
+        self.value = value
+
+def decode_string(string):
+    """
+    Converts every escape sequence (\\ddd) in string to the coresponding character, in one pass
+    """
+
+    return escapePattern.sub(lambda sequence: chr(int(sequence.group(1))), string)
+
+def decode_constant(argType, text):
+    """
+    Converts the text of the constant to the native value (int, bool or decoded str)
+    """
+
+    if (argType == "int"):
+        return int(text)
+    elif (argType == "bool"):
+        return text == "true"
+    elif (argType == "string"):
+        return decode_string(text)
+    elif (argType == "nil"):
+        return nil
+    return text
+
+def value_to_str(value):
+    """
+    Returns the value in the form, that is printed by WRITE and DPRINT
+    """
+
+    if (type(value) is bool):
+        return "true" if value else "false"
+    elif (value is nil):
+        return ""
+    return str(value)
+
+def compile_operand(inst, kind, argType, text, constantPool):
+    """
+    Checks the argument against the expected operand kind and decodes it
+
+    Parameters:
+    inst (Element): Instruction element, used in error messages
+    kind (str): Expected operand kind (var, symb, label or type)
+    argType (str): Value of the 'type' attribute
+    text (str): Text of the argument
+    constantPool (dict): Already decoded constants, shared by the whole program
+    """
+
+    if (argType == "var"):
+        if (kind not in ("var", "symb")):
+            err_msg("Variable '{}' is not expected in instruction {}".format(text, inst.attrib), UnexpectedXMLStructureErr)
+
+        match = varNamePattern.match(text)
+        if (match is None):
+            err_msg("{} is not valid var name in instruction {}".format(text, inst.attrib), UnexpectedXMLStructureErr)
+        return Operand(argType, text, match.group(1), match.group(2))
+
+    if (kind == "var"):
+        err_msg("{} is not valid var name in instruction {}".format(text, inst.attrib), UnexpectedXMLStructureErr)
+    elif (kind == "label" and argType != "label"):
+        err_msg("Argument is not a label type in instruction '{}'".format(inst.attrib), UnexpectedXMLStructureErr)
+    elif (kind == "type" and argType != "type"):
+        err_msg("Argument type in argument {} have to be 'type'... Instruction: {}".format(text, inst.attrib), UnexpectedXMLStructureErr)
+    elif (kind == "symb" and argType not in ("int", "bool", "string", "nil")):
+        err_msg("The <symb> value is not valid in instruction {}".format(inst.attrib), UnexpectedXMLStructureErr)
+
+    # Every constant is decoded only once and the operand is shared
+    try:
+        return constantPool[(argType, text)]
+    except KeyError:
+        operand = Operand(argType, text, value=decode_constant(argType, text))
+        constantPool[(argType, text)] = operand
+        return operand
+
+class Instruction(object):
+    """
+    Pre-decoded instruction, the interpret executes only these records
+    """
+
+    __slots__ = ("opcode", "order", "args", "handler")
+
+    def __init__(self, opcode, order, args):
+        self.opcode = opcode
+        self.order = order
+        self.args = args
+        try:
+            self.handler = opcodeHandlers[opcode]
+        except KeyError:
+            err_msg("Invalid instruction '{}'".format(opcode), UnexpectedXMLStructureErr)
+
+    def __str__(self):
+        return "{{'order': '{}', 'opcode': '{}'}}".format(self.order, self.opcode)
+
+def compile_instruction(inst, constantPool):
+    """
+    Decodes one checked xml instruction to the Instruction record
+
+    Parameters:
+    inst (Element): Instruction element read from the source file
+    constantPool (dict): Already decoded constants, shared by the whole program
+    """
+
+    opcode = inst.attrib["opcode"].upper()
+    try:
+        kinds = instructionOperands[opcode]
+    except KeyError:
+        err_msg("Invalid instruction '{}'".format(opcode), UnexpectedXMLStructureErr)
+    if (len(kinds) != len(inst)):
+        err_msg("Wrong number of arguments in instruction {}".format(inst.attrib), UnexpectedXMLStructureErr)
+
+    args = [None] * len(inst)
+    for arg in inst:
+        if (arg.tag not in ("arg1", "arg2", "arg3")):
+            err_msg("Unexpected argument tag '{}' in instruction {}".format(arg.tag, inst.attrib), UnexpectedXMLStructureErr)
+
+        index = int(arg.tag[3:]) - 1
+        if (index >= len(args) or args[index] is not None):
+            err_msg("Wrong argument numbering in instruction {}".format(inst.attrib), UnexpectedXMLStructureErr)
+
+        text = arg.text
+        if (text is None):
+            text = ""
+        args[index] = compile_operand(inst, kinds[index], arg.attrib["type"], text, constantPool)
+
+    return Instruction(opcode, int(inst.attrib["order"]), tuple(args))
+
+def link_program(program):
+    """
+    Checks all the labels if they are unique and rewrites every <label> operand
+    to the index of its LABEL instruction. Returns the label table.
+
+    Parameters:
+    program (list): Compiled Instruction records
+    """
+
+    labels = UniqueDict()
+    for index, inst in enumerate(program):
+        if (inst.opcode == "LABEL"):
+            try:
+                labels[inst.args[0].text] = index
+            except KeyError:
+                err_msg("Label '{}' in instruction {} is being redefined".format(inst.args[0].text, inst), SemanticErr)
+
+    for inst in program:
+        if (inst.opcode in jumpingInst):
+            label = inst.args[0]
+            try:
+                label.value = labels[label.text]
+            except KeyError:
+                err_msg("Undefined label with name '{}' in instruction {}".format(label.text, inst), SemanticErr)
+
+    link_variables(program)
+
+    return labels
+
+def link_variables(program):
+    """
+    Gives every variable name its slot in the frames and rewrites every <var> operand
+    to that slot. GF variables have their own slots, LF and TF variables share the local slots
+    (the temporary frame becomes the local one). Returns the global and the local variable names indexed by the slots.
+    The slots are given in the order of the first use, so linking the program again gives the same slots.
+
+    Parameters:
+    program (list): Compiled Instruction records
+    """
+
+    globalSlots = {}
+    localSlots = {}
+    for inst in program:
+        for arg in inst.args:
+            if (arg.type == "var"):
+                slots = globalSlots if arg.frame == "GF" else localSlots
+                arg.value = slots.setdefault(arg.name, len(slots))
+
+    return list(globalSlots), list(localSlots)
+
+def same_variable(arg1, arg2):
+    """
+    Checks if both operands are the same variable
+    """
+
+    return arg1.type == "var" and arg2.type == "var" and arg1.frame == arg2.frame and arg1.name == arg2.name
+
+def constant_operand(value):
+    """
+    Creates the constant operand of the folded value
+    """
+
+    argType = valueTypes[type(value)]
+    return Operand(argType, "nil" if value is nil else value_to_str(value), value=value)
+
+def fold_constant(inst):
+    """
+    Computes the result of the instruction, which has only constant <symb> operands.
+    Returns None, when the instruction cannot be folded (it ends with an error at run time or it's not pure),
+    so the error codes stay the same as without the optimization.
+    """
+
+    opcode = inst.opcode
+    if (opcode not in foldableInst):
+        return None
+    symbs = inst.args[1:]
+    for arg in symbs:
+        if (arg.type == "var"):
+            return None
+    values = [arg.value for arg in symbs]
+    types = tuple(arg.type for arg in symbs)
+
+    if (opcode in ("ADD", "SUB", "MUL", "IDIV")):
+        if (types != ("int", "int")):
+            return None
+        if (opcode == "ADD"):
+            return values[0] + values[1]
+        elif (opcode == "SUB"):
+            return values[0] - values[1]
+        elif (opcode == "MUL"):
+            return values[0] * values[1]
+        elif (values[1] != 0):
+            return values[0] // values[1]
+    elif (opcode in ("LT", "GT")):
+        if (types[0] == types[1] and types[0] in ("int", "string", "bool")):
+            return values[0] < values[1] if opcode == "LT" else values[0] > values[1]
+    elif (opcode in ("EQ", "JUMPIFEQ", "JUMPIFNEQ")):
+        if ("nil" in types):
+            return types[0] == types[1]
+        if (types[0] == types[1]):
+            return values[0] == values[1]
+    elif (opcode in ("AND", "OR")):
+        if (types == ("bool", "bool")):
+            return values[0] and values[1] if opcode == "AND" else values[0] or values[1]
+    elif (opcode == "NOT"):
+        if (types == ("bool",)):
+            return not values[0]
+    elif (opcode == "INT2CHAR"):
+        if (types == ("int",) and 0 <= values[0] <= sys.maxunicode):
+            return chr(values[0])
+    elif (opcode in ("STRI2INT", "GETCHAR")):
+        if (types == ("string", "int") and 0 <= values[1] < len(values[0])):
+            char = values[0][values[1]]
+            return ord(char) if opcode == "STRI2INT" else char
+    elif (opcode == "CONCAT"):
+        if (types == ("string", "string")):
+            return values[0] + values[1]
+    elif (opcode == "STRLEN"):
+        if (types == ("string",)):
+            return len(values[0])
+    elif (opcode == "TYPE"):
+        return types[0]
+    return None
+
+def fold_constants(program):
+    """
+    Replaces the instructions with only constant operands by MOVE of the result,
+    and the conditional jumps on constants, which are always taken, by JUMP.
+    Returns how many instructions were folded.
+
+    Parameters:
+    program (list): Linked Instruction records, the folded records are replaced in place
+    """
+
+    folded = 0
+    for index, inst in enumerate(program):
+        value = fold_constant(inst)
+        if (value is None):
+            continue
+
+        if (inst.opcode in ("JUMPIFEQ", "JUMPIFNEQ")):
+            # The jump, which is never taken, has to stay, it's counted as the executed instruction
+            if (value != (inst.opcode == "JUMPIFEQ")):
+                continue
+            program[index] = Instruction("JUMP", inst.order, inst.args[:1])
+        else:
+            program[index] = Instruction("MOVE", inst.order, (inst.args[0], constant_operand(value)))
+        folded += 1
+
+    return folded
+
+def instruction_successors(inst, index):
+    """
+    Returns the indexes of the instructions, that can be executed after the instruction.
+    CALL continues after RETURN, JUMP, RETURN and EXIT never continue to the next instruction.
+    """
+
+    successors = []
+    if (inst.opcode in jumpingInst):
+        successors.append(inst.args[0].value)
+    if (inst.opcode not in ("JUMP", "RETURN", "EXIT")):
+        successors.append(index + 1)
+    return successors
+
+def operand_type(arg, state):
+    """
+    Returns the proven type of the <symb> operand, or None
+    """
+
+    if (arg.type != "var"):
+        return arg.type
+    if (arg.frame != "GF"):
+        return None
+    return state.get(arg.value)
+
+def transfer_types(inst, state):
+    """
+    Updates the proven types of the GF variables in place, as they are after the instruction is executed (without an error)
+
+    Parameters:
+    inst (Instruction): Executed instruction
+    state (dict): Slot of every defined GF variable and its type (None when it's unknown) before the instruction
+    """
+
+    opcode = inst.opcode
+    if (opcode in operandTypes):
+        for arg in inst.args[1:]:
+            if (arg.type == "var" and arg.frame == "GF"):
+                state[arg.value] = operandTypes[opcode]
+
+    kinds = instructionOperands[opcode]
+    if (len(kinds) > 0 and kinds[0] == "var" and inst.args[0].frame == "GF"):
+        slot = inst.args[0].value
+        if (opcode == "MOVE"):
+            state[slot] = operand_type(inst.args[1], state)
+        else:
+            state[slot] = resultTypes.get(opcode)
+
+def flow_successors(inst, index, returnSites):
+    """
+    Returns the indexes of the instructions, that the data-flow analysis continues to after the instruction.
+    CALL continues to its target, RETURN can continue after every CALL.
+    """
+
+    if (inst.opcode == "CALL"):
+        return [inst.args[0].value]
+    elif (inst.opcode == "RETURN"):
+        return returnSites
+    return instruction_successors(inst, index)
+
+def flow_blocks(program, returnSites):
+    """
+    Returns the start indexes of the basic blocks of the program, in the order of the program.
+    The block starts at the jump target and after every instruction, which doesn't simply continue to the next one.
+    """
+
+    starts = {0}
+    for index, inst in enumerate(program):
+        successors = flow_successors(inst, index, returnSites)
+        if (successors != [index + 1]):
+            starts.update(successors)
+            starts.add(index + 1)
+    return sorted(start for start in starts if start < len(program))
+
+def infer_types(program):
+    """
+    Data-flow analysis over the control-flow graph of the program (made from the labels and jumps).
+    The states are kept only at the starts of the basic blocks, the block is walked with one state.
+    Returns the start and the end of every basic block with the GF variables, which are surely defined
+    at its start, with their proven types (see transfer_types), or None for the block, which is never executed.
+    Only the global frame is analysed, the local and temporary frames change with the calls.
+
+    Parameters:
+    program (list): Linked Instruction records
+    """
+
+    if (len(program) == 0):
+        return []
+
+    returnSites = [index + 1 for index, inst in enumerate(program) if inst.opcode == "CALL"]
+    starts = flow_blocks(program, returnSites)
+    ends = dict(zip(starts, starts[1:] + [len(program)]))
+    states = dict.fromkeys(starts)
+    states[0] = {}
+    waiting = [0]
+    while waiting:
+        start = waiting.pop()
+        state = dict(states[start])
+        for index in range(start, ends[start]):
+            transfer_types(program[index], state)
+
+        last = ends[start] - 1
+        for successor in flow_successors(program[last], last, returnSites):
+            if (successor >= len(program)):
+                continue
+            old = states[successor]
+            if (old is None):
+                new = state
             else:
-                err_msg("The second argument is not a string in {}".format(inst.attrib), WrongOperandTypeErr)
+                # Only the variables defined on both paths stay, with the type only if it's the same
+                new = {slot: varType if state[slot] == varType else None
+                       for slot, varType in old.items() if slot in state}
+            if (new != old):
+                states[successor] = new
+                waiting.append(successor)
+
+    return [(start, ends[start], states[start]) for start in starts]
+
+def specialize_types(program):
+    """
+    Replaces the handlers of the instructions, whose operand types are proven by infer_types,
+    by the handlers without checks (typedHandlers). Returns how many instructions were specialized.
+
+    Parameters:
+    program (list): Linked Instruction records, the specialized records are replaced in place
+    """
+
+    specialized = 0
+    for start, end, entryState in infer_types(program):
+        if (entryState is None):
+            continue
+        # The state of the instruction, it's updated while the block is walked
+        state = dict(entryState)
+        for index in range(start, end):
+            inst = program[index]
+            specialized += specialize_instruction(program, index, state)
+            transfer_types(inst, state)
+
+    return specialized
+
+def specialize_instruction(program, index, state):
+    """
+    Replaces the handler of the instruction by the typed handler, when the state proves its operand types.
+    Returns 1 when the instruction was specialized, otherwise 0.
+    """
+
+    inst = program[index]
+    # The fused instructions keep their handlers
+    if (inst.handler is not opcodeHandlers[inst.opcode]):
+        return 0
+
+    args = inst.args
+    kinds = instructionOperands[inst.opcode]
+    if (len(kinds) == 0):
+        return 0
+    # The written variable has to be surely defined
+    if (kinds[0] == "var" and (args[0].frame != "GF" or args[0].value not in state)):
+        return 0
+    types = []
+    for arg in args[1:]:
+        if (arg.type == "var" and arg.frame != "GF"):
+            return 0
+        types.append(operand_type(arg, state))
+
+    handler = typedHandlers.get((inst.opcode, tuple(types)))
+    if (handler is None):
+        return 0
+    typed = Instruction(inst.opcode, inst.order, args)
+    typed.handler = handler
+    program[index] = typed
+    return 1
+
+def remove_unreachable(program):
+    """
+    Removes the instructions, which cannot be reached from the start of the program,
+    and links the labels again. Returns how many instructions were removed.
+
+    Parameters:
+    program (list): Linked Instruction records, changed in place
+    """
+
+    reachable = [False] * len(program)
+    waiting = [0]
+    while waiting:
+        index = waiting.pop()
+        if (index >= len(program) or reachable[index]):
+            continue
+        reachable[index] = True
+
+        waiting.extend(instruction_successors(program[index], index))
+
+    removed = reachable.count(False)
+    if (removed > 0):
+        program[:] = [inst for index, inst in enumerate(program) if reachable[index]]
+        link_program(program)
+    return removed
+
+def fuse_pair(inst, nextInst):
+    """
+    Returns the name of the pattern, that the instruction pair matches, or None
+    """
+
+    if (inst.opcode in boolResultInst and nextInst.opcode in ("JUMPIFEQ", "JUMPIFNEQ")):
+        operands = nextInst.args[1:]
+        for var, constant in (operands, operands[::-1]):
+            if (same_variable(inst.args[0], var) and constant.type == "bool"):
+                return "compare+jump"
+    elif (inst.opcode == "DEFVAR" and nextInst.opcode == "MOVE"):
+        if (same_variable(inst.args[0], nextInst.args[0])):
+            return "defvar+move"
+    elif (inst.opcode == "PUSHS" and nextInst.opcode == "POPS"):
+        return "pushs+pops"
+    return None
+
+def optimize_program(program):
+    """
+    Optimizer of the loaded program. At first the constant instructions are folded
+    and the unreachable instructions are removed. Then the peephole optimizer fuses the known
+    instruction pairs to one instruction, which executes both.
+    The second instruction stays in the program (it's only skipped), so the label indexes
+    and the instruction count are not changed. At last the instructions with the proven operand types
+    get the handlers without checks. Returns how many times every pattern was fused,
+    how many instructions were folded, removed and specialized.
+
+    No jump can land on the second instruction, because it follows neither LABEL nor CALL.
+
+    Parameters:
+    program (list): Linked Instruction records, changed in place
+    """
+
+    report = {"constant-folding": fold_constants(program), "unreachable": remove_unreachable(program)}
+    report.update((pattern, 0) for pattern in fusedHandlers)
+    index = 0
+    while index < len(program) - 1:
+        pattern = fuse_pair(program[index], program[index + 1])
+        if (pattern is None):
+            index += 1
+            continue
+
+        # New record, the original one can be shared (e.g. by the cache)
+        inst = program[index]
+        fused = Instruction(inst.opcode, inst.order, inst.args)
+        fused.handler = fusedHandlers[pattern]
+        program[index] = fused
+        report[pattern] += 1
+        index += 2
+
+    report["typed"] = specialize_types(program)
+    return report
+
+class CompiledProgram(list):
+    """
+    Program, whose basic blocks are compiled to Python functions (made by compile_program).
+    It's still the list of the Instruction records, the blocks are run by Interpret.run_blocks.
+    """
+
+    def __init__(self, program, blocks):
+        super().__init__(program)
+        # Block by the index of its first instruction
+        self.blocks = blocks
+
+class Block(object):
+    """
+    Basic block of the compiled program, it's interpreted when it's executed for the first time
+    and its function is compiled (by compile_block) for the next times
+    """
 
-            if (arg3Type != "int"):
-                err_msg("The third argument is not an int in {}".format(inst.attrib), WrongOperandTypeErr)
-            if (int(arg3Value) < 0):
-                err_msg("Negative number in index in instruction {}".format(inst.attrib), StringOperationErr)
-            try:
-                argStruct = {'type': 'string', 'value': arg2Value[int(arg3Value)]}
-            except IndexError:
-                err_msg("GETCHAR is out of the string index in instruction {}".format(inst.attrib), StringOperationErr)
-            varsFrame[name] = argStruct
+    __slots__ = ("start", "end", "size", "entered", "function")
 
-        def setchar():
-            """
-            Set char to agr1 string from arg3 on arg2 index
-            """
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.size = end - start
+        self.entered = False
+        self.function = None
 
-            name, varsFrame, arg2Type, arg2Value, arg3Type, arg3Value = get_var_symb_symb()
+# Instructions, after which the basic block ends (LABEL ends it, because jumps continue after it)
+blockEndInst = jumpingInst + ["LABEL", "RETURN", "EXIT", "BREAK"]
+# Python operators of the instructions compiled inline
+inlineOperators = {"ADD": "+", "SUB": "-", "MUL": "*", "IDIV": "//", "LT": "<", "GT": ">", "EQ": "==",
+                   "AND": "and", "OR": "or", "JUMPIFEQ": "==", "JUMPIFNEQ": "!="}
+frameAttributes = {"GF": "GF", "LF": "LFTop", "TF": "TF"}
+maxBlockSize = 100
 
-            arg1Type = varsFrame[name]["type"]
-            arg1Value = varsFrame[name]["value"]
+def operand_code(arg, name, frames):
+    """
+    Returns the Python expression of the <symb> operand and the guard of its type
+    (None, when the constant has the wrong type and the instruction can't be inlined)
 
-            if (arg1Type is None or arg1Value is None):
-                err_msg("Uninitialized variadble in arg: arg1. In instruction: {}".format(inst.attrib), MissingValueErr)
+    Parameters:
+    arg (Operand): Linked operand
+    name (str): Local variable, which gets the value of the variable operand
+    frames (dict): Frames used by the instruction with their highest used slot, they are loaded before it
+    """
 
-            if (arg1Type == "string"):
-                arg1Value = convert_unicode_values_in_string(arg1Value)
-            else:
-                err_msg("The first argument is not a string in {}".format(inst.attrib), WrongOperandTypeErr)
+    if (arg.type != "var"):
+        return repr(arg.value) if arg.value is not nil else "nil", arg.type
+    frames[arg.frame] = max(frames.get(arg.frame, 0), arg.value)
+    return "({} := {}[{}])".format(name, arg.frame, arg.value), None
 
-            if (arg2Type != "int"):
-                err_msg("The second argument is not an int in {}".format(inst.attrib), WrongOperandTypeErr)
-            if (int(arg2Value) < 0):
-                err_msg("Negative number in index in instruction {}".format(inst.attrib), StringOperationErr)
+def frame_conditions(frames):
+    """
+    Returns the guards, that the local and temporary frames used by the instruction exist
+    and have all the used slots (they grow with DEFVAR)
+    """
 
-            if (arg3Type == "string"):
-                arg3Value = convert_unicode_values_in_string(arg3Value)
-            else:
-                err_msg("The third argument is not a string in {}".format(inst.attrib), WrongOperandTypeErr)
+    return ["{0} is not None and len({0}) > {1}".format(frame, frames[frame]) for frame in sorted(frames) if frame != "GF"]
 
-            if(len(arg3Value) < 1):
-                err_msg("You want to set something into empty string in {}".format(inst.attrib), StringOperationErr)
+def inline_code(inst):
+    """
+    Returns the guard and the statement of the instruction compiled inline, or None.
+    The statement is executed only when the guard holds, so it doesn't check anything,
+    otherwise the reference handler is called and it does all the checks (and ends with the same error).
+    """
 
-            string_list = list(arg1Value)
-            try:
-                string_list[int(arg2Value)] = arg3Value[0]
-            except:
-                err_msg("IndexError during SETCHAR instruction in {}".format(inst.attrib), StringOperationErr)
-
-            value = "".join(string_list)
-            argStruct = {'type': 'string', 'value': value}
-            varsFrame[name] = argStruct
-
-
-        ########            MAIN               ##########
-        instructions = {
-            "CREATEFRAME": create_frame,
-            "PUSHFRAME": push_frame,
-            "POPFRAME": pop_frame,
-            "RETURN": _return,
-            "BREAK": _break,
-            # 1 argument
-            "DEFVAR": defvar,
-            "CALL": call,
-            "PUSHS": pushs,
-            "POPS": pops,
-            "WRITE": write,
-            "LABEL": label,
-            "JUMP": jump,
-            "EXIT": _exit,
-            "DPRINT": dprint,
-            # 2 arguments
-            "MOVE": move,
-            "INT2CHAR": int2char,
-            "READ": _read,
-            "STRLEN": strlen,
-            "TYPE": _type,
-            "NOT": _not,
-            # 3 arguments
-            "ADD": add,
-            "SUB": sub,
-            "MUL": mul,
-            "IDIV": idiv,
-            "LT": lt,
-            "GT": gt,
-            "EQ": eq,
-            "AND": _and,
-            "OR": _or,
-            "STRI2INT": stri2int,
-            "CONCAT": concat,
-            "GETCHAR": getchar,
-            "SETCHAR": setchar,
-            "JUMPIFEQ": jumpifeq,
-            "JUMPIFNEQ": jumpifneq,
-        }
-        
-        result = instructions.get(inst.attrib["opcode"].upper(),
-                                        lambda: err_msg("Invalid instruction '{}'".format(inst.attrib["opcode"].upper()), UnexpectedXMLStructureErr))
-        return result()
+    opcode = inst.opcode
+    if (opcode not in inlineOperators and opcode not in ("MOVE", "NOT", "PUSHS", "POPS")):
+        return None
+
+    frames = {}
+    if (opcode == "PUSHS"):
+        expression, constantType = operand_code(inst.args[0], "v0", frames)
+        if (constantType is not None):
+            return "True", "interp.varStack.append({})".format(expression), frames
+        conditions = frame_conditions(frames)
+        conditions.append("type({}) in valueTypes".format(expression))
+        return " and ".join(conditions), "interp.varStack.append(v0)", frames
+
+    guards = []
+    values = []
+    for index, arg in enumerate(inst.args[1:]):
+        expression, constantType = operand_code(arg, "v{}".format(index), frames)
+        values.append(expression if constantType is not None else "v{}".format(index))
+        guards.append((expression, constantType))
+
+    # Types of the operands, that the statement expects
+    if (opcode in ("ADD", "SUB", "MUL", "IDIV")):
+        wanted = ("int", "int")
+    elif (opcode in ("AND", "OR", "NOT")):
+        wanted = ("bool",) * len(guards)
+    elif (opcode in ("LT", "GT")):
+        wanted = "same"
+    elif (opcode in ("EQ", "JUMPIFEQ", "JUMPIFNEQ")):
+        wanted = "same-value"
+    else:
+        wanted = ("value",)
+
+    conditions = []
+    if (wanted in ("same", "same-value")):
+        for expression, constantType in guards:
+            if (constantType is not None and constantType not in ("int", "string", "bool")):
+                return None
+        (left, leftType), (right, rightType) = guards
+        if (leftType is not None and rightType is not None and leftType != rightType):
+            return None
+        conditions.append("type({}) is type({})".format(left, right))
+        conditions.append("type({}) in {}".format(values[0], "(int, str, bool)"))
+    else:
+        for (expression, constantType), wantedType in zip(guards, wanted):
+            if (constantType is None):
+                if (wantedType == "value"):
+                    # The string buffer stays only in its variable
+                    conditions.append("type({}) in valueTypes".format(expression))
+                else:
+                    conditions.append("type({}) is {}".format(expression, {"int": "int", "bool": "bool"}[wantedType]))
+            elif (wantedType != "value" and constantType != wantedType):
+                return None
+    if (opcode == "IDIV"):
+        conditions.append("{} != 0".format(values[1]))
+
+    if (opcode in ("JUMPIFEQ", "JUMPIFNEQ")):
+        return " and ".join(frame_conditions(frames) + conditions), "{} {} {}".format(values[0], inlineOperators[opcode], values[1]), frames
+
+    target = inst.args[0]
+    frames[target.frame] = max(frames.get(target.frame, 0), target.value)
+    conditions = frame_conditions(frames) + conditions
+    targetCode = "{}[{}]".format(target.frame, target.value)
+    conditions.append("{} is not undefined".format(targetCode))
+    if (opcode == "POPS"):
+        conditions.append("interp.varStack")
+        statement = "{} = interp.varStack.pop()".format(targetCode)
+    elif (opcode == "MOVE"):
+        statement = "{} = {}".format(targetCode, values[0])
+    elif (opcode == "NOT"):
+        statement = "{} = not {}".format(targetCode, values[0])
+    else:
+        statement = "{} = {} {} {}".format(targetCode, values[0], inlineOperators[opcode], values[1])
+    return " and ".join(dict.fromkeys(conditions)), statement, frames
 
-class UniqueDict(dict):
-    def __setitem__(self, key, value):
-        if (key not in self):
-            dict.__setitem__(self, key, value)
-        else:
-            raise KeyError("Key already exists")
+def block_code(program, start, end):
+    """
+    Returns the Python source of the block function, which executes the instructions start..end-1
+    and returns the index of the next instruction
+    """
 
-class XMLParse(object):
-    def __init__(self, sourceXml):
-        """
-        Creating the list of instructions in IPPCode20.
-        Transforming the XML source file content to xmlElementTree.
+    lines = ["def block_{}(interp):".format(start), "    GF = interp.GF"]
+    for index in range(start, end):
+        inst = program[index]
+        handler = "h{0}(interp, i{0})".format(index)
+        lines.append("    # {} (order {})".format(inst.opcode, inst.order))
+
+        inline = inline_code(inst)
+        if (inline is not None):
+            condition, statement, frames = inline
+            for frame in sorted(frames):
+                if (frame != "GF"):
+                    lines.append("    {} = interp.{}".format(frame, frameAttributes[frame]))
+            lines.append("    if ({}):".format(condition))
+            if (inst.opcode in ("JUMPIFEQ", "JUMPIFNEQ")):
+                lines.append("        return {} if {} else {}".format(inst.args[0].value + 1, statement, index + 1))
+            else:
+                lines.append("        {}".format(statement))
+                lines.append("    else:")
+                lines.append("        {}".format(handler))
+                continue
+
+        if (inst.opcode == "JUMP"):
+            lines.append("    return {}".format(inst.args[0].value + 1))
+        elif (inst.opcode == "CALL"):
+            # RETURN continues after the CALL, its index is stored like in the reference handler
+            lines.append("    if (interp.instPointerStack is None):")
+            lines.append("        interp.instPointerStack = []")
+            lines.append("    interp.instPointerStack.append({})".format(index))
+            lines.append("    return {}".format(inst.args[0].value + 1))
+        elif (inst.opcode in jumpingInst or inst.opcode == "RETURN"):
+            lines.append("    newPointer = {}".format(handler))
+            lines.append("    return (newPointer if newPointer is not None else {}) + 1".format(index))
+        elif (inst.opcode != "LABEL"):
+            lines.append("    {}".format(handler))
+    lines.append("    return {}".format(end))
+    return "\n".join(lines) + "\n"
+
+def compile_block(program, block):
+    """
+    Compiles the block to the Python function, the handlers and records of its instructions are its globals
+    """
 
-        Parameters:
-        sourceXml (string): Xml source file
-        """
+    # The fused handlers execute more instructions, so the blocks use only the reference ones
+    namespace = {"undefined": undefined, "nil": nil, "valueTypes": valueTypes}
+    for index in range(block.start, block.end):
+        namespace["h{}".format(index)] = opcodeHandlers[program[index].opcode]
+        namespace["i{}".format(index)] = program[index]
 
-        self.listOfinstructions = [
-            "CREATEFRAME", "PUSHFRAME", "POPFRAME", "RETURN", "BREAK",
-            
-            "DEFVAR", "CALL", "PUSHS", "POPS", "WRITE", "LABEL", "JUMP", "EXIT", "DPRINT",
+    source = block_code(program, block.start, block.end)
+    exec(compile(source, "<IPPcode20 block {}>".format(block.start), "exec"), namespace)
+    return namespace["block_{}".format(block.start)]
 
-            "MOVE", "INT2CHAR", "READ", "STRLEN", "TYPE", "NOT",
+def compile_program(program):
+    """
+    Splits the program to the basic blocks (at LABEL and jump boundaries). Every block is compiled
+    to the Python function, when it's executed for the second time, so the code, which runs only once,
+    doesn't pay for the compilation. The simple instructions are inlined with the guards of the operand types,
+    the others call their reference handlers, so the semantics and error codes stay the same.
+    Returns the CompiledProgram.
+
+    Parameters:
+    program (list): Linked Instruction records (can be optimized)
+    """
 
-            "ADD", "SUB", "MUL", "IDIV", "LT", "GT", "EQ", "AND", "OR", "STRI2INT", "CONCAT",                     
-            "GETCHAR", "SETCHAR", "JUMPIFEQ", "JUMPIFNEQ"]
-        try:
-            elementTree = xmlElementTree.fromstring(sourceXml)
-        except xmlElementTree.ParseError:
-            err_msg("The source XML file is not well-formed.", WrongXMLFromatErr)
+    leaders = [0]
+    for index, inst in enumerate(program):
+        # Long blocks are split, so the compiled functions stay small
+        if (inst.opcode in blockEndInst or index + 1 - leaders[-1] >= maxBlockSize):
+            leaders.append(index + 1)
+
+    blocks = [None] * len(program)
+    for start, end in zip(leaders, leaders[1:]):
+        if (start < end):
+            blocks[start] = Block(start, end)
+    if (leaders[-1] < len(program)):
+        blocks[leaders[-1]] = Block(leaders[-1], len(program))
+    return CompiledProgram(program, blocks)
+
+class ProgramCache(object):
+    """
+    On-disk cache of the checked and linked programs.
+    Entries are keyed by the hash of the source file and of the interpret itself.
 
-        self.elementTree = elementTree
-        self.program_tag_check()
-        self.program_tree = self.make_program_tree()
-    
-    def program_tag_check(self):
-        """
-        Checks for the XML tag 'program' which is mandatory.
-        Next it check for valid attribute 'language'.
-        """
+    File format: magic, sha256 of the payload, marshal payload.
+    The payload holds the table of unique operands and the instructions referencing them.
+    """
 
-        if (self.elementTree.tag == "program"):
-            try:
-                self.elementTree.attrib["language"]
-            except KeyError:
-                err_msg("The 'language' atribute is missing in a source file", UnexpectedXMLStructureErr)
+    magic = b"IPPcode20-cache\n"
 
-            if (self.elementTree.attrib["language"] != "IPPcode20"):
-                err_msg("'language' attribute has wrong value (IPPCode20 is expected)", UnexpectedXMLStructureErr)
-        else:       # Missing or wrong program tag
-            err_msg("Source file have missing or wrong 'program' tag", UnexpectedXMLStructureErr)
+    def __init__(self, cacheDir):
+        self.cacheDir = cacheDir
 
-    def make_program_tree(self):
+    def source_key(self, source):
         """
-        Builds the program instructions tree from source file
+        Returns the cache key of the opened binary source file
         """
 
-        program_tree = [None] * len(self.elementTree)
-        unique_order_arr = {}
-        unique_order_arr = UniqueDict(unique_order_arr)
-
-        for inst in self.elementTree:
-            
-            self.check_instruction(inst)
+        keyHash = hashlib.sha256()
+        keyHash.update(interpret_fingerprint())
+        keyHash.update(sys.version.encode())
 
-            try:
-                unique_order_arr[int(inst.attrib["order"]) - 1] = inst
-            except KeyError:
-                err_msg("Order numbers are not unique", UnexpectedXMLStructureErr)
-        
-        orders = []
-        for element in unique_order_arr:
-            orders.append(element)
-        orders.sort()
+        with source:
+            for chunk in iter(lambda: source.read(1 << 20), b""):
+                keyHash.update(chunk)
 
-        index = 0
-        for order in orders:
-            try:
-                program_tree[index] = unique_order_arr[order]
-                program_tree[index].attrib["order"] = index
-            except:
-                err_msg("Some of the instructions had the same order number", UnexpectedXMLStructureErr)
-            
-            index += 1
+        return keyHash.hexdigest()
 
-        return program_tree
+    def entry_path(self, key):
+        return path.join(self.cacheDir, key + ".ippc")
 
-    
-    def check_instruction(self, inst):
+    def load(self, key):
         """
-        Checks if everything is valid in every instruction inside of the source file
-        Exit with error if the instruction is not defined by IPPCode20
+        Returns the cached program, or None if it is missing, stale or corrupt
         """
-        
-        if (inst.tag != "instruction"):
-            err_msg("Wrong instruction tag in instruction {}".format(inst.attrib), UnexpectedXMLStructureErr)
 
-        # Is there 'order' attribute?
         try:
-            inst.attrib["order"]
-        except KeyError:
-            err_msg("Missing 'order' attribute in instruction {}".format(inst.attrib), UnexpectedXMLStructureErr)
+            with open(self.entry_path(key), 'rb') as cacheFile:
+                data = cacheFile.read()
+        except OSError:
+            return None
 
-        # Is there 'opcode' attribute?
-        try:
-            inst.attrib["opcode"]
-        except KeyError:
-            err_msg("Missing 'opcode' attribute in instruction {}".format(inst.attrib), UnexpectedXMLStructureErr)
+        header = len(self.magic) + 32
+        if (data[:len(self.magic)] != self.magic or len(data) < header):
+            return None
 
-        # Check arguments
-        if (inst.attrib["opcode"].upper() in instructionsWithoutArgs and len(inst) != 0):
-            err_msg("Instruction {} shouldn't have any arguments".format(inst.attrib["opcode"]), UnexpectedXMLStructureErr)
-        else:
-            # Check for number of arguments
-            if (inst.attrib["opcode"].upper() in instructionsWithOneArg and len(inst) != 1):
-                err_msg("Instruction {} should have exactly one argument".format(inst.attrib["opcode"]), UnexpectedXMLStructureErr)
-            if (inst.attrib["opcode"].upper() in instructionsWithTwoArg and len(inst) != 2):
-                err_msg("Instruction {} should have exactly two arguments".format(inst.attrib["opcode"]), UnexpectedXMLStructureErr)
-            if (inst.attrib["opcode"].upper() in instructionsWithThreeArg and len(inst) != 3):
-                err_msg("Instruction {} should have exactly three argument".format(inst.attrib["opcode"]), UnexpectedXMLStructureErr)
+        payload = data[header:]
+        if (hashlib.sha256(payload).digest() != data[len(self.magic):header]):
+            return None
 
-            for arg in inst:
-                try:
-                    arg.attrib["type"]
-                except KeyError:
-                    err_msg("Argument {} without 'type'".format(arg.attrib), UnexpectedXMLStructureErr)
-                 
-                if (arg.attrib["type"] not in argumentTypes):
-                    err_msg("Argument type is not supported in {}".format(arg.attrib), UnexpectedXMLStructureErr)
+        try:
+            return deserialize_program(marshal.loads(payload))
+        except (ValueError, EOFError, TypeError, IndexError, KeyError, InterpretError):
+            return None
 
-                # Check text format of arguments
-                if (arg.attrib["type"] == "int"):
-                    if (not re.match('^(\+|-|)[0-9]+$', arg.text)):
-                        err_msg("Integer with value '{}' is not supported".format(arg.text), UnexpectedXMLStructureErr)
-                elif (arg.attrib["type"] == "bool"):
-                    if (not re.match('^(true|false)$', arg.text)):
-                        err_msg("Bool with value '{}' is not supported".format(arg.text), UnexpectedXMLStructureErr)
-                elif (arg.attrib["type"] == "string"):
-                    if (arg.text != None):
-                        if (not re.match('^([^\\\\\#\s]|(\\\\\d{3}))*$', arg.text)):
-                            err_msg("String with value '{}' is not supported".format(arg.text), UnexpectedXMLStructureErr)
-                elif (arg.attrib["type"] == "label"):
-                    if (not re.match('^[a-zA-Z_\-\$&%*!?][0-9a-zA-Z_\-\$&%*!?]*$', arg.text)):
-                        err_msg("Label with value '{}' is not supported".format(arg.text), UnexpectedXMLStructureErr)
-                elif (arg.attrib["type"] == "nil"):
-                    if (not re.match('^nil$', arg.text)):
-                        err_msg("Nil with value '{}' is not supported".format(arg.text), UnexpectedXMLStructureErr)
+    def store(self, key, program):
+        """
+        Stores the program to the cache, the cache is optional, so failures are ignored
+        """
 
+        payload = marshal.dumps(serialize_program(program))
         try:
-            order = int(inst.attrib["order"])
-        except ValueError:
-            err_msg("The 'order' number is not a number in instruction {}".format(inst.attrib), UnexpectedXMLStructureErr)
+            os.makedirs(self.cacheDir, exist_ok=True)
+            fileDes, tmpPath = tempfile.mkstemp(dir=self.cacheDir, suffix=".tmp")
+            with os.fdopen(fileDes, 'wb') as cacheFile:
+                cacheFile.write(self.magic + hashlib.sha256(payload).digest() + payload)
+            os.replace(tmpPath, self.entry_path(key))
+        except OSError:
+            pass
+
+def interpret_fingerprint():
+    """
+    Returns the hash of this script, so the cache entries are rebuilt when the interpret changes
+    """
 
-        numOfInst = int(inst.attrib["order"])
+    with open(path.abspath(__file__), 'rb') as scriptFile:
+        return hashlib.sha256(scriptFile.read()).digest()
 
-        # Order attribute checks
-        if (numOfInst < 1):
-            err_msg("Order attribute in instruction {} is lower than 1".format(inst.attrib), UnexpectedXMLStructureErr)
+def serialize_program(program):
+    """
+    Converts the program to the builtin types, which can be stored by marshal
+    """
 
-        if (inst.attrib["opcode"].upper() not in self.listOfinstructions):
-            err_msg("Operation code in {} is not valid in IPPCode20".format(inst.attrib), UnexpectedXMLStructureErr)
+    operandIndexes = {}
+    operands = []
+    instructions = []
 
-    def get_program_tree(self):
-        """
-        Returns the program_tree
+    for inst in program:
+        args = []
+        for arg in inst.args:
+            if (id(arg) not in operandIndexes):
+                operandIndexes[id(arg)] = len(operands)
+                value = None if arg.value is nil else arg.value
+                operands.append((arg.type, arg.text, arg.frame, arg.name, value))
+            args.append(operandIndexes[id(arg)])
+        instructions.append((inst.opcode, inst.order, tuple(args)))
 
-        """
+    return (tuple(operands), tuple(instructions))
+
+def deserialize_program(data):
+    """
+    Builds the program from the data made by serialize_program
+    """
+
+    operandsData, instructionsData = data
+    operands = []
+    for argType, text, frame, name, value in operandsData:
+        if (argType == "nil"):
+            value = nil
+        operands.append(Operand(argType, text, frame, name, value))
+
+    return [Instruction(opcode, order, tuple(operands[index] for index in args))
+            for opcode, order, args in instructionsData]
+
+def load_program(sourceFile, cacheDir=None):
+    """
+    Returns the compiled program of the source file (path or stdin),
+    with cacheDir the program is taken from the cache when it was already compiled
+    """
 
-        return self.program_tree
+    if (cacheDir is None):
+        return XMLParse(sourceFile).get_program()
 
+    cache = ProgramCache(cacheDir)
+    if (type(sourceFile) == str):
+        try:
+            key = cache.source_key(open(sourceFile, 'rb'))
+        except OSError:
+            err_msg("Source file '{}' cannot be read".format(sourceFile), InputFileErr)
+    else:       # stdin can be read only once, so it is kept for the parser
+        sourceFile = io.BytesIO(sourceFile.buffer.read())
+        key = cache.source_key(io.BytesIO(sourceFile.getvalue()))
+    program = cache.load(key)
+    if (program is None):
+        program = XMLParse(sourceFile).get_program()
+        cache.store(key, program)
+    return program
 
 def parse_and_check_args():
     """
@@ -1267,8 +2972,11 @@ def parse_and_check_args():
     """
 
     sourceFile = inputFile = None
+    settings = {"output": None, "output-mode": "spool", "cache-dir": None, "optimize": False, "compile": False, "profile": None,
+                "stats": None, "max-insts": None, "batch": None, "jobs": None, "serve": None, "connect": None,
+                "cache-size": 64, "timeout": None}
     try:
-        options, args = getopt.getopt(sys.argv[1:],"",["help", "source=", "input="])
+        options, args = getopt.getopt(sys.argv[1:],"",["help", "source=", "input=", "output=", "output-mode=", "cache-dir=", "optimize", "compile", "profile=", "stats=", "max-insts=", "batch=", "jobs=", "serve=", "connect=", "cache-size=", "timeout="])
     except getopt.GetoptError:
         err_msg("Wrong arguments", WrongArgsErr)
     for option, filename in options:
@@ -1280,54 +2988,518 @@ def parse_and_check_args():
             print("     --help             Prints short help about script")
             print("     --source=<file>    Source file, that contains IPPCode20 instructions in XML format (if not passed, reading stdin)")
             print("     --input=<file>     Input file, that will be interpreted (if not passed, reading stdin)")
+            print("     --output=<file>    File, where the output of the program is written (if not passed, writing stdout)")
+            print("     --output-mode=<m>  spool  - output is written when the program ends, thrown away on error (default)")
+            print("                        stream - output is written in large chunks while the program runs")
+            print("                        line   - output is written after every new line")
+            print("     --cache-dir=<dir>  Directory, where the compiled programs are cached between runs")
+            print("     --optimize         Folds the constant instructions, removes the unreachable ones and fuses")
+            print("                        the common instruction pairs, specializes the instructions with proven")
+            print("                        operand types, prints what was changed to stderr")
+            print("     --compile          Compiles the basic blocks of the program to Python functions")
+            print("     --profile=<file>   Writes the count and time of every opcode and instruction to the file (and <file>.json)")
+            print("     --stats=<file>     Writes the executed instructions, peak initialized variables and stack depths as JSON")
+            print("     --max-insts=<n>    Stops the program with error {} after n executed instructions".format(InstructionLimitErr))
+            print("     --batch=<file>     Runs the jobs from the JSONL manifest ({\"source\": .., \"input\": .., \"expected\": ..} lines),")
+            print("                        results are written as JSONL to stdout (or --output file) in the manifest order")
+            print("     --jobs=<n>         Number of worker processes in the batch and server mode (default number of CPUs)")
+            print("     --serve=<socket>   Runs the interpret server on the Unix socket")
+            print("     --cache-size=<n>   Number of the compiled programs kept by every server worker (default 64)")
+            print("     --timeout=<s>      Time limit of one server request in seconds (error {})".format(InstructionLimitErr))
+            print("     --connect=<socket> Sends the --source and --input to the interpret server and prints its results")
             sys.exit(0)
         elif (option == "--source"):
             sourceFile = filename
         elif (option == "--input"):
             inputFile = filename
+        elif (option == "--output"):
+            settings["output"] = filename
+        elif (option == "--output-mode"):
+            if (filename not in OutputWriter.outputModes):
+                err_msg("Unknown output mode '{}'".format(filename), WrongArgsErr)
+            settings["output-mode"] = filename
+        elif (option == "--cache-dir"):
+            settings["cache-dir"] = filename
+        elif (option == "--optimize"):
+            settings["optimize"] = True
+        elif (option == "--compile"):
+            settings["compile"] = True
+        elif (option == "--profile"):
+            settings["profile"] = filename
+        elif (option == "--stats"):
+            settings["stats"] = filename
+        elif (option == "--max-insts"):
+            try:
+                settings["max-insts"] = int(filename)
+            except ValueError:
+                err_msg("Instruction limit is not a number", WrongArgsErr)
+            if (settings["max-insts"] < 0):
+                err_msg("Instruction limit cannot be negative", WrongArgsErr)
+        elif (option == "--batch"):
+            settings["batch"] = filename
+        elif (option == "--serve"):
+            settings["serve"] = filename
+        elif (option == "--connect"):
+            settings["connect"] = filename
+        elif (option == "--cache-size"):
+            try:
+                settings["cache-size"] = int(filename)
+            except ValueError:
+                err_msg("Cache size is not a number", WrongArgsErr)
+            if (settings["cache-size"] < 1):
+                err_msg("Cache size has to be positive", WrongArgsErr)
+        elif (option == "--timeout"):
+            try:
+                settings["timeout"] = float(filename)
+            except ValueError:
+                err_msg("Timeout is not a number", WrongArgsErr)
+            if (settings["timeout"] <= 0):
+                err_msg("Timeout has to be positive", WrongArgsErr)
+        elif (option == "--jobs"):
+            try:
+                settings["jobs"] = int(filename)
+            except ValueError:
+                err_msg("Number of jobs is not a number", WrongArgsErr)
+            if (settings["jobs"] < 1):
+                err_msg("Number of jobs has to be positive", WrongArgsErr)
         else:
             err_msg("Uknown arguments", WrongArgsErr)
 
+    # The compiled blocks don't call the measured handlers
+    if (settings["compile"] and (settings["profile"] is not None or settings["stats"] is not None)):
+        err_msg("--compile cannot be combined with --profile or --stats", WrongArgsErr)
+
+    # Sources and inputs of the batch and server mode are in the manifest or in the requests
+    if (settings["batch"] is not None or settings["serve"] is not None):
+        if (sourceFile is not None or inputFile is not None):
+            err_msg("--batch and --serve cannot be combined with --source or --input", WrongArgsErr)
+        return sourceFile, inputFile, settings
+
     if (sourceFile is None and inputFile is None):
         err_msg("Source or input file have to be passed", WrongArgsErr)
     
+    # The files are only checked here, XMLParse and READ read them incrementally
     if (sourceFile is not None and path.isfile(sourceFile)):
-        with open(sourceFile, 'r', encoding='utf-8') as srcFileDes:
-                sourceFile = srcFileDes.read()
-        if (inputFile is not None and path.isfile(inputFile)):      # Nothing from stdin
-            with open(inputFile, 'r', encoding='utf-8') as inFileDes:
-                inputFile = inFileDes.read()
-        else:   # Input from stdin
-            if (inputFile is None):
-                inputFile = sys.stdin.read()
-            else:
-                err_msg("Wrong input file", WrongArgsErr)
+        if (inputFile is not None and not path.isfile(inputFile)):
+            err_msg("Wrong input file", WrongArgsErr)
     elif (inputFile is not None and path.isfile(inputFile)):    # Source from stdin
-        with open(inputFile, 'r', encoding='utf-8') as inFileDes:
-            inputFile = inFileDes.read()
         if (sourceFile is None):
-            sourceFile = sys.stdin.read()
+            sourceFile = sys.stdin
         else:
             err_msg("Wrong source file", WrongArgsErr)
     else:
         err_msg("Wrong file/files given",WrongArgsErr)
-    return sourceFile, inputFile
+    return sourceFile, inputFile, settings
+
+def open_input(inputFile):
+    """
+    Opens the --input file, or returns stdin when it is not given
+    """
+
+    if (inputFile is None):
+        return sys.stdin
+    try:
+        return open(inputFile, 'r', encoding='utf-8')
+    except OSError:
+        err_msg("Input file '{}' cannot be opened".format(inputFile), InputFileErr)
+
+def open_output(settings):
+    """
+    Opens the --output file, or returns stdout when it is not given
+    """
+
+    stream = sys.stdout
+    if (settings["output"] is not None):
+        try:
+            stream = open(settings["output"], 'w', encoding='utf-8')
+        except OSError:
+            err_msg("Output file '{}' cannot be opened".format(settings["output"]), OutputFileErr)
+
+    return stream
+
+def run(program, inputStream=None, outputStream=None, errorStream=None, maxInsts=None, outputMode="spool"):
+    """
+    Runs the program and returns its exit code, the error messages are written to errorStream
+    (the same way as the command line interpret does). It can be called more times in one process.
+
+    Parameters:
+    program (list|str|file): Compiled program (see load_program), or path or stream of the XML source
+    inputStream (file): Input of the READ instruction (default stdin)
+    outputStream (file): Output of the WRITE instruction (default stdout)
+    errorStream (file): Output of DPRINT, BREAK and of the error messages (default stderr)
+    maxInsts (int): Limit of the executed instructions (default no limit)
+    outputMode (str): Mode of the OutputWriter (spool, stream or line)
+    """
+
+    if (inputStream is None):
+        inputStream = sys.stdin
+    if (outputStream is None):
+        outputStream = sys.stdout
+    if (errorStream is None):
+        errorStream = sys.stderr
+
+    output = OutputWriter(outputStream, outputMode)
+    try:
+        if (not isinstance(program, list)):
+            program = XMLParse(program).get_program()
+        Interpret(program, InputReader(inputStream), output, maxInsts, errorStream).interpret_the_language()
+    except ProgramExit as exitCall:
+        return exitCall.code
+    except InterpretError as error:
+        print("Error: " + error.message, file=errorStream)
+        return error.code
+    except Exception as error:          # Bug of the interpret
+        print("Error: Internal error {!r}".format(error), file=errorStream)
+        return InternalErr
+    finally:
+        output.abort()
+    return 0
 
             
+# Compiled programs of the batch worker process, shared by its jobs
+batchPrograms = {}
+batchSettings = {}
+
+def read_manifest(manifestFile):
+    """
+    Reads the jobs of the batch mode, every line of the manifest is JSON object
+    with the source and optionally the input and expected output. Paths are relative to the manifest.
+    """
+
+    baseDir = path.dirname(path.abspath(manifestFile))
+    jobs = []
+    try:
+        with open(manifestFile, 'r', encoding='utf-8') as manifest:
+            for lineNumber, line in enumerate(manifest, 1):
+                if (line.strip() == ""):
+                    continue
+                try:
+                    job = json.loads(line)
+                    source = job["source"]
+                except (ValueError, KeyError, TypeError):
+                    err_msg("Wrong job on the line {} of the manifest".format(lineNumber), InputFileErr)
+                jobs.append(tuple(None if job.get(key) is None else path.join(baseDir, job[key])
+                                  for key in ("source", "input", "expected")))
+    except OSError:
+        err_msg("Manifest file '{}' cannot be opened".format(manifestFile), InputFileErr)
+    return jobs
+
+def init_batch_worker(settings):
+    """
+    Stores the settings in the batch worker process
+    """
+
+    batchSettings.update(settings)
+
+def batch_program(sourceFile):
+    """
+    Returns the compiled program of the batch worker, every source is loaded only once.
+    If the program cannot be loaded, returns the error.
+    """
+
+    try:
+        return batchPrograms[sourceFile]
+    except KeyError:
+        pass
+
+    try:
+        program = load_program(sourceFile, batchSettings["cache-dir"])
+        if (batchSettings["optimize"]):
+            optimize_program(program)
+        if (batchSettings["compile"]):
+            program = compile_program(program)
+    except InterpretError as error:
+        program = error
+    batchPrograms[sourceFile] = program
+    return program
+
+def run_batch_job(job):
+    """
+    Runs one job of the batch in the worker process, returns its result
+    """
+
+    sourceFile, inputFile, expectedFile = job
+    start = time.perf_counter()
+    outputStream = io.StringIO()
+    errorStream = io.StringIO()
+
+    try:
+        program = batch_program(sourceFile)
+        if (isinstance(program, InterpretError)):
+            print("Error: " + program.message, file=errorStream)
+            exitCode = program.code
+        else:
+            try:
+                inputStream = io.StringIO() if inputFile is None else open(inputFile, 'r', encoding='utf-8')
+            except OSError:
+                print("Error: Input file '{}' cannot be opened".format(inputFile), file=errorStream)
+                exitCode = InputFileErr
+            else:
+                with inputStream:
+                    exitCode = run(program, inputStream, outputStream, errorStream, batchSettings["max-insts"])
+    except Exception as error:          # Bug of the interpret, the other jobs still get their results
+        print("Error: Internal error {!r}".format(error), file=errorStream)
+        exitCode = InternalErr
+
+    output = outputStream.getvalue()
+    result = {"source": sourceFile, "input": inputFile, "rc": exitCode,
+              "stdout-sha256": hashlib.sha256(output.encode('utf-8')).hexdigest(),
+              "time": time.perf_counter() - start}
+    if (expectedFile is not None):
+        try:
+            with open(expectedFile, 'r', encoding='utf-8') as expected:
+                result["matches"] = expected.read() == output
+        except OSError:
+            result["matches"] = None
+    if (exitCode != 0):
+        result["stderr"] = errorStream.getvalue()
+    return result
+
+def run_batch(settings):
+    """
+    Runs the jobs of the manifest in the process pool and writes the results (JSONL) in the manifest order
+    """
+
+    jobs = read_manifest(settings["batch"])
+    resultStream = open_output(settings)
+    workers = settings["jobs"] or os.cpu_count() or 1
+    workerSettings = {key: settings[key] for key in ("cache-dir", "optimize", "compile", "max-insts")}
+
+    with multiprocessing.Pool(workers, init_batch_worker, (workerSettings,)) as pool:
+        for result in pool.imap(run_batch_job, jobs, chunksize=max(1, min(64, len(jobs) // (workers * 4)))):
+            resultStream.write(json.dumps(result) + "\n")
+            resultStream.flush()
+
+# Compiled programs of the server worker process (LRU), keyed by the hash of the source
+serverPrograms = collections.OrderedDict()
+serverSettings = {}
+
+def init_server_worker(settings):
+    """
+    Stores the settings in the server worker process
+    """
+
+    serverSettings.update(settings)
+
+def server_program(source):
+    """
+    Returns the compiled program of the source text from the LRU cache of the worker.
+    If the program cannot be loaded, returns the error.
+    """
+
+    key = hashlib.sha256(source.encode('utf-8', 'surrogatepass')).digest()
+    try:
+        serverPrograms.move_to_end(key)
+        return serverPrograms[key]
+    except KeyError:
+        pass
+
+    try:
+        program = XMLParse(io.BytesIO(source.encode('utf-8', 'surrogatepass'))).get_program()
+        if (serverSettings["optimize"]):
+            optimize_program(program)
+        if (serverSettings["compile"]):
+            program = compile_program(program)
+    except InterpretError as error:
+        program = error
+
+    serverPrograms[key] = program
+    if (len(serverPrograms) > serverSettings["cache-size"]):
+        serverPrograms.popitem(last=False)
+    return program
+
+def time_limit_exceeded(signum, frame):
+    """
+    Signal handler of the request time limit, the error ends the running program
+    """
+
+    err_msg("Time limit of the request exceeded", InstructionLimitErr)
+
+def serve_request(request):
+    """
+    Runs one request in the server worker process, returns the response
+    """
+
+    outputStream = io.StringIO()
+    errorStream = io.StringIO()
+
+    # The request can only lower the limits of the server
+    maxInsts = request.get("max-insts", serverSettings["max-insts"])
+    if (serverSettings["max-insts"] is not None and (maxInsts is None or maxInsts > serverSettings["max-insts"])):
+        maxInsts = serverSettings["max-insts"]
+    timeout = request.get("timeout", serverSettings["timeout"])
+    if (serverSettings["timeout"] is not None and (timeout is None or timeout > serverSettings["timeout"])):
+        timeout = serverSettings["timeout"]
+
+    program = server_program(request.get("source", ""))
+    if (isinstance(program, InterpretError)):
+        print("Error: " + program.message, file=errorStream)
+        exitCode = program.code
+    else:
+        if (timeout is not None):
+            signal.signal(signal.SIGALRM, time_limit_exceeded)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            exitCode = run(program, io.StringIO(request.get("input", "")), outputStream, errorStream, maxInsts)
+        except InterpretError as error:     # Time limit outside of the interpretation
+            print("Error: " + error.message, file=errorStream)
+            exitCode = error.code
+        finally:
+            if (timeout is not None):
+                signal.setitimer(signal.ITIMER_REAL, 0)
+
+    return {"rc": exitCode, "stdout": outputStream.getvalue(), "stderr": errorStream.getvalue()}
+
+def request_limit_check(value, types):
+    """
+    Checks the limit asked by the request, it has to be missing, null or the non-negative number
+
+    Parameters:
+        value: Value of the limit from the request
+        types: Allowed types of the limit
+    """
+
+    if (value is None):
+        return
+    if (type(value) not in types or not value >= 0 or value == float("inf")):
+        raise ValueError
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """
+    One connection is one request, the client sends the JSON request and closes its side,
+    the server answers with the JSON response
+    """
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.read().decode('utf-8'))
+            if (type(request) != dict or type(request.get("source")) != str or type(request.get("input", "")) != str):
+                raise ValueError
+            request_limit_check(request.get("max-insts"), (int,))
+            request_limit_check(request.get("timeout"), (int, float))
+        except ValueError:
+            response = {"rc": InternalErr, "stdout": "", "stderr": "Error: Wrong request\n"}
+        else:
+            try:
+                response = self.server.pool.apply(serve_request, (request,))
+            except Exception as error:  # The client gets the response even when the worker fails
+                response = {"rc": InternalErr, "stdout": "", "stderr": "Error: Request failed: {}\n".format(error)}
+        self.wfile.write(json.dumps(response).encode('utf-8'))
+
+class InterpretServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve(settings):
+    """
+    Runs the interpret server on the Unix socket, until it's interrupted
+    """
+
+    socketFile = settings["serve"]
+    # Only the socket left by the previous server is replaced
+    if (path.exists(socketFile)):
+        if (not stat.S_ISSOCK(os.stat(socketFile).st_mode)):
+            err_msg("File '{}' exists and it's not a socket".format(socketFile), OutputFileErr)
+        os.unlink(socketFile)
+
+    workers = settings["jobs"] or os.cpu_count() or 1
+    workerSettings = {key: settings[key] for key in ("optimize", "compile", "max-insts", "cache-size", "timeout")}
+    with multiprocessing.Pool(workers, init_server_worker, (workerSettings,)) as pool:
+        try:
+            with InterpretServer(socketFile, RequestHandler) as server:
+                server.pool = pool
+                signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+                server.serve_forever()
+        except OSError:
+            err_msg("Socket '{}' cannot be created".format(socketFile), OutputFileErr)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if (path.exists(socketFile)):
+                os.unlink(socketFile)
+
+def send_request(socketFile, sourceFile, inputFile, maxInsts=None, timeout=None):
+    """
+    Sends the source and input to the interpret server with the limits of the client, returns its response.
+    The input is sent only when the --input file is given, stdin isn't read (the program could never READ).
+    """
+
+    if (type(sourceFile) == str):
+        with open(sourceFile, 'r', encoding='utf-8') as source:
+            sourceText = source.read()
+    else:
+        sourceText = sourceFile.read()
+
+    request = {"source": sourceText}
+    if (inputFile is not None):
+        with open_input(inputFile) as inputStream:
+            request["input"] = inputStream.read()
+    if (maxInsts is not None):
+        request["max-insts"] = maxInsts
+    if (timeout is not None):
+        request["timeout"] = timeout
+
+    request = json.dumps(request).encode('utf-8')
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(socketFile)
+            connection.sendall(request)
+            connection.shutdown(socket.SHUT_WR)
+            response = b"".join(iter(lambda: connection.recv(65536), b""))
+        return json.loads(response.decode('utf-8'))
+    except (OSError, ValueError):
+        err_msg("Interpret server '{}' is not available".format(socketFile), InternalErr)
+
 def err_msg(message, errCode):
 	""" 
-	Print the error message, and end with error code.
+	Raise the error with error code, the command line interpret prints the message and ends with the error code.
 	
 	Parameters: 
 	errCode (int): Error code
 	message (str): Message, that will be printed to stderr
 	"""	
 	
-	print("Error: " + message, file=sys.stderr)
-	sys.exit(errCode)
+	raise errorClasses.get(errCode, InterpretError)(message, errCode)
 
 if __name__ == '__main__':
-    (sourceFile, inputFile) = parse_and_check_args()
-    program_tree = XMLParse(sourceFile).get_program_tree()
-    Interpret(program_tree, inputFile).interpret_the_language()
-    sys.exit(0)
\ No newline at end of file
+    try:
+        (sourceFile, inputFile, settings) = parse_and_check_args()
+        if (settings["batch"] is not None):
+            run_batch(settings)
+            sys.exit(0)
+        if (settings["serve"] is not None):
+            serve(settings)
+            sys.exit(0)
+        if (settings["connect"] is not None):
+            response = send_request(settings["connect"], sourceFile, inputFile, settings["max-insts"], settings["timeout"])
+            sys.stdout.write(response["stdout"])
+            sys.stderr.write(response["stderr"])
+            sys.exit(response["rc"])
+        program = load_program(sourceFile, settings["cache-dir"])
+        if (settings["optimize"]):
+            report = optimize_program(program)
+            print("Optimized: {}".format(", ".join("{} {}x".format(pattern, count) for pattern, count in report.items())),
+                  file=sys.stderr)
+        if (settings["compile"]):
+            program = compile_program(program)
+        statistics = profiler = None
+        if (settings["stats"] is not None):
+            statistics = Statistics(settings["stats"])
+            program = statistics.instrument(program)
+        if (settings["profile"] is not None):
+            profiler = Profiler(settings["profile"])
+            program = profiler.instrument(program)
+        outputStream = open_output(settings)
+        inputStream = open_input(inputFile)
+    except InterpretError as error:
+        print("Error: " + error.message, file=sys.stderr)
+        sys.exit(error.code)
+
+    try:
+        exitCode = run(program, inputStream, outputStream, sys.stderr, settings["max-insts"], settings["output-mode"])
+    finally:
+        # The reports are written also when the program ends by EXIT or by an error
+        if (statistics is not None):
+            statistics.write()
+        if (profiler is not None):
+            profiler.write()
+    sys.exit(exitCode)
@@ -0,0 +1,172 @@
+import getopt
+import glob
+import importlib.util
+import io
+import multiprocessing
+import os
+import os.path as path
+import sys
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), "test_src"))
+import html_part
+
+WrongArgsErr = 10
+InputFileErr = 11
+OutputFileErr = 12
+
+# Interpret module, it's imported once in every worker process
+interpretModule = None
+
+def rglob(testDir):
+    """
+    Goes through directories and search for the *.src files
+    """
+
+    testFiles = []
+    for directory, subdirs, files in os.walk(testDir):
+        for file in files:
+            if (file.endswith(".src")):
+                testFiles.append(path.join(directory, file))
+    return sorted(testFiles)
+
+def create_missing_files(testName):
+    """
+    Creates the missing .in, .out and .rc files with the default values
+    """
+
+    for suffix, default in ((".in", ""), (".rc", "0"), (".out", "")):
+        if (not path.exists(testName + suffix)):
+            try:
+                with open(testName + suffix, "w", encoding="utf-8") as file:
+                    file.write(default)
+            except OSError:
+                err_msg("Couldn't create a file", OutputFileErr)
+
+def init_worker(intFile):
+    """
+    Imports the interpret in the worker process, so it's not started for every test
+    """
+
+    global interpretModule
+    spec = importlib.util.spec_from_file_location("interpret_under_test", intFile)
+    interpretModule = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(interpretModule)
+
+def run_interpret(testName):
+    """
+    Runs the interpret in-process, returns its exit code, stdout and stderr
+    """
+
+    errors = io.StringIO()
+    stdout = io.StringIO()
+    with open(testName + ".in", encoding="utf-8") as inputFile:
+        intRC = interpretModule.run(testName + ".src", inputFile, stdout, errors)
+
+    return intRC, stdout.getvalue(), errors.getvalue()
+
+def int_only(testName):
+    """
+    Run the test only for the interpreter, the same way as test.php
+    """
+
+    intRC, intOut, intErr = run_interpret(testName)
+    # Like PHP exec(), the lines are without the trailing whitespace
+    intOut = "\n".join(line.rstrip() for line in intOut.splitlines())
+
+    with open(testName + ".rc", encoding="utf-8") as file:
+        referenceRC = file.read().strip()
+    with open(testName + ".out", encoding="utf-8") as file:
+        referenceOut = file.read()
+
+    if (referenceRC == str(intRC) and referenceOut == intOut):     # Everything's good
+        return {"testName": testName, "passed": True}
+
+    diff = ""
+    if (referenceRC != str(intRC)):
+        diff = "Reference RC = {}, Interpret RC = {}\n".format(referenceRC, intRC)
+    if (referenceOut != intOut):
+        diff += "\n Reference Out: {} \n Interpret Out: {}".format(referenceOut, intOut)
+    if (intErr):
+        diff += "\n Interpret Err: {}".format(intErr)
+    return {"testName": testName, "passed": False, "diff": diff}
+
+def parse_and_check_args():
+    """
+    Parse the arguments from command line
+    """
+
+    testDir = "./"
+    recursive = False
+    intFile = path.join(path.dirname(path.abspath(__file__)), "interpret.py")
+    jobs = os.cpu_count() or 1
+    try:
+        options, args = getopt.getopt(sys.argv[1:], "", ["help", "directory=", "recursive", "int-script=", "int-only", "jobs="])
+    except getopt.GetoptError:
+        err_msg("Unknown option", WrongArgsErr)
+    if (len(args) > 0):
+        err_msg("Unknown option", WrongArgsErr)
+
+    for option, value in options:
+        if (option == "--help"):
+            if (len(sys.argv) != 2):
+                err_msg("--help cannot take any more arguments.", WrongArgsErr)
+            print("USAGE: python3.8 test.py [OPTIONS]\n")
+            print("DESCRIPTION:    Test.py script is testing interpret.py by running it with the src (XML) files")
+            print("                and comparing its results with the referencing ones.")
+            print("                Tests run in parallel, the interpret is run in-process in every worker.")
+            print("                When the comparison is done, the html report is printed on stdout.\n")
+            print("OPTIONS:")
+            print("      --help               Prints short help for this script")
+            print("      --directory=<dir>    Directory where the reference test results are stored (If not given, ./ is used)")
+            print("      --recursive          Look for the test recursively inside of 'directory' file")
+            print("      --int-script=<file>  Name of the interpret script (If not given, interpret.py is used)")
+            print("      --int-only           Test only interpret script (the only supported mode, accepted for test.php compatibility)")
+            print("      --jobs=<n>           Number of worker processes (If not given, number of CPUs is used)")
+            sys.exit(0)
+        elif (option == "--directory"):
+            testDir = path.realpath(value)
+            if (not path.isdir(testDir)):
+                err_msg("--directory=<dir> is not a directory", InputFileErr)
+        elif (option == "--recursive"):
+            recursive = True
+        elif (option == "--int-script"):
+            intFile = path.realpath(value)
+            if (not path.isfile(intFile)):
+                err_msg("--int-script=<file> is not a file", InputFileErr)
+        elif (option == "--jobs"):
+            try:
+                jobs = int(value)
+            except ValueError:
+                err_msg("--jobs=<n> is not a number", WrongArgsErr)
+            if (jobs < 1):
+                err_msg("--jobs=<n> has to be positive", WrongArgsErr)
+
+    return testDir, recursive, intFile, jobs
+
+def err_msg(message, errCode):
+    """
+    Print the error message, and end with error code.
+    """
+
+    print("Error: " + message, file=sys.stderr)
+    sys.exit(errCode)
+
+if __name__ == '__main__':
+    (testDir, recursive, intFile, jobs) = parse_and_check_args()
+
+    if (recursive):
+        testFiles = rglob(testDir)
+    else:
+        testFiles = sorted(glob.glob(path.join(testDir, "*.src")))
+
+    testNames = []
+    for testFile in testFiles:
+        testName = testFile[:-len(".src")]
+        create_missing_files(testName)
+        testNames.append(testName)
+
+    with multiprocessing.Pool(jobs, init_worker, (intFile,)) as pool:
+        resultArray = pool.map(int_only, testNames, chunksize=max(1, len(testNames) // (jobs * 8)))
+
+    testsFailed = sum(1 for result in resultArray if not result["passed"])
+    sys.stdout.write(html_part.render(resultArray, len(testNames), testsFailed))
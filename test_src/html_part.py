@@ -0,0 +1,187 @@
+import html
+
+# Same page as html-part.php, used by test.py
+htmlHead = """<!DOCTYPE html>
+<html>
+<head> <title> IPPCode20 </title>
+    <meta content="text/html; charset=UTF-8">
+    <style>
+        body {
+            background: white;
+            font-family: Helvetica;
+        }
+        .my-container {
+            max-width: 1100px;
+            margin-right: auto;
+            margin-left: auto;
+            flex-basis: auto;
+
+            display: flex;
+            flex-wrap: wrap;
+        }
+
+        .my-container > * {
+            padding: 10px;
+        }
+
+        .res-box {
+            text-align: center;
+            background: #3269a8;
+            border-radius: 0px 0px 15px 15px;
+            margin-bottom: 20px;
+            padding-top: 10px;
+            padding-bottom: 10px;
+            font-size: 25px;
+            font-weight: bold;
+        }
+
+        .head-box {
+            text-align: center;
+            background: #3269a8;
+            font-size: 25px;
+            margin-bottom: 10px;
+            padding: 5px;
+        }
+
+        h3 {
+            padding: 5px;
+            margin-bottom: 0px;
+        }
+
+        p {
+            margin: 5px;
+        }
+        .res {
+        color: black;
+        font-weight: bold;
+        font-family: Helvetica;
+        }
+
+        .res em {
+        color: #ed2b2b;
+        font-style: normal;
+        }
+
+
+        .flexed {
+            flex-basis: 100%;
+        }
+
+        .test {
+            text-align: center;
+            background: #42a4f5;
+            border-radius: 15px 15px 0px 0px;
+            font-size: 18px;
+            padding-top: 15px;
+            padding-bottom: 15px;
+        }
+
+        .fail {
+            background: tomato;
+            border: 5px solid red;
+        }
+
+        .pass {
+            background-color: #80e27e;
+            border: 5px solid green;
+        }
+
+        button {
+            border: 0;
+            font-weight: bold;
+            background-color: #000;
+            padding: 15px 20px;
+            color: #fff;
+            transition: all 0.2s;
+        }
+
+        button:hover {
+            background-color: #424040;
+        }
+
+        textarea {
+            background-color: #ba2222;
+            border: 2px solid darkred;
+            font-size: 16px;
+            width: auto;
+            height: auto;
+            min-width: 70%;
+            min-height: 200px;
+        }
+
+    </style>
+</head>
+<body>
+"""
+
+htmlTail = """
+<script>
+    function showDiff(event) {
+        var tmp = event.target.nextElementSibling;
+        if (tmp.style.display === "none") {
+            tmp.style.display = "block";
+        } else {
+            tmp.style.display = "none";
+        }
+    }
+</script>
+</body>
+</html>
+"""
+
+def render(resultArray, testsCount, testsFailed):
+    """
+    Returns the html report of the tests
+
+    Parameters:
+    resultArray (list): Results with testName, passed and optionally diff or errMsg
+    testsCount (int): Number of all tests
+    testsFailed (int): Number of failed tests
+    """
+
+    testsPassed = testsCount - testsFailed
+    page = [htmlHead]
+    page.append('<div class="my-container" style="max-width: 1500px;">\n')
+    page.append('    <header class="head-box flexed">\n')
+    page.append('    <h3> Results from test.py </h3>\n')
+    page.append('    <p class="res" style="margin-top: 10px;"> Total tests: {}</p>\n'.format(testsCount))
+
+    if (testsFailed > 0):
+        page.append('    <p class="res"> Failed: <em>{}</em>/{}</p>\n'.format(testsFailed, testsCount))
+    else:
+        page.append('    <p class="res"> Failed: {}/{}</p>\n'.format(testsFailed, testsCount))
+
+    if (testsPassed > 0):
+        page.append('    <p class="res" style="margin-bottom: 15px;"> Passed: <em style="color: #3dd447;">{}</em>/{}</p>\n'
+                    .format(testsPassed, testsCount))
+    else:
+        page.append('    <p class="res" style="margin-bottom: 15px;"> Passed: {}/{}</p>\n'.format(testsPassed, testsCount))
+
+    successRate = round(testsPassed / testsCount * 100, 2) if testsCount > 0 else 0
+    if (successRate < 30):
+        color = "#ed2b2b"
+    elif (successRate < 70):
+        color = "#ebce42"
+    else:
+        color = "#3dd447"
+    page.append('    <p class="res" style="margin-top: 10px;"> Working on : <em style="color: {};">{}</em>%</p>\n'
+                .format(color, successRate))
+    page.append('    </header>\n</div>\n<div class="my-container">\n')
+
+    for result in resultArray:
+        passed = result["passed"]
+        page.append('    <article class="test flexed">{}</article>\n'.format(html.escape(result["testName"])))
+        page.append('    <article class="res-box flexed {}">\n'.format("pass" if passed else "fail"))
+        page.append('        <p> RESULT: {}</p>\n'.format("PASSED" if passed else "FAILED"))
+        if ("diff" in result):
+            page.append('            <button onclick="showDiff(event)">Show diff</button>\n')
+            page.append('            <div style="display: none;">\n')
+            page.append('                <textarea readonly>{}</textarea>\n'.format(html.escape(result["diff"])))
+            page.append('            </div>\n')
+        elif (not passed):
+            page.append('            <p style="font-size: 16px;">Error: {}</p>\n'.format(html.escape(result.get("errMsg", ""))))
+        page.append('    </article>\n')
+
+    page.append('</div>\n')
+    page.append(htmlTail)
+    return "".join(page)